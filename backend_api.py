@@ -3,12 +3,26 @@
 基于Flask提供RESTful API接口，连接MACore业务逻辑与前端界面
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from flow import create_fengshui_analysis_flow, create_bazi_only_flow, create_fengshui_consultation_flow, create_quick_daily_flow
+from flow import create_fengshui_analysis_flow, create_hedged_fengshui_analysis_flow, create_single_shot_fengshui_analysis_flow, create_bazi_only_flow, create_fengshui_consultation_flow, create_quick_daily_flow
 from utils.calendar_query import get_daily_fortune, find_auspicious_days
+from utils.cache_store import open_cache
+from utils.job_queue import JobQueue, JobQueueFull
+from utils.analysis_cache import NAME_PLACEHOLDER, analysis_cache_stats, personalize, signature_key
+from nodes import create_fortune_analysis_node
+from macore import Tracer, AsyncFlow, HedgedAsyncNode, FlowTimeout, circuit_breaker_states, resource_pool, resource_pool_stats, PoolSaturated, single_flight, single_flight_stats, stable_hash
+from concurrent.futures import ThreadPoolExecutor, wait
+import asyncio
+import copy
+import functools
+import json
+import threading
+import time
 import traceback
 import logging
+import math
+import os
 from datetime import datetime
 
 # 配置日志
@@ -23,16 +37,240 @@ CORS(app,
      allow_headers=['Content-Type', 'Authorization'],
      supports_credentials=True)
 
+# 每次流程运行的重试时间预算（秒），超出后节点不再重试而直接走降级逻辑
+FLOW_RETRY_BUDGET = float(os.getenv("FLOW_RETRY_BUDGET", "45"))
+
+# 每次流程运行的总时限（秒），超时后在节点之间中止并返回错误，异步流程会直接取消进行中的LLM请求
+FLOW_TIMEOUT = float(os.getenv("FLOW_TIMEOUT", "90"))
+
+# 设置FLOW_TRACE_DIR后，每次流程运行都会记录各节点耗时并保存为Chrome trace文件（chrome://tracing 打开）
+FLOW_TRACE_DIR = os.getenv("FLOW_TRACE_DIR")
+
+# 流程检查点：客户端携带相同run_id（或Idempotency-Key请求头）重试时，从第一个未完成的节点继续
+# 设置FLOW_CHECKPOINT_PATH时使用SQLite文件（多进程共享），否则使用进程内存储；检查点保留15分钟
+FLOW_CHECKPOINT_PATH = os.getenv("FLOW_CHECKPOINT_PATH")
+CHECKPOINT_STORE = open_cache(FLOW_CHECKPOINT_PATH, maxsize=5000, ttl=900, memory_maxsize=1000)
+
+# 开启后完整分析使用对冲请求版本的异步流程（LLM_HEDGE_DELAY / LLM_HEDGE_PROVIDERS 控制对冲行为）
+ENABLE_LLM_HEDGING = os.getenv("ENABLE_LLM_HEDGING", "false").lower() in ("1", "true", "yes")
+
+# 开启后完整分析的命理分析与综合报告合并为一次LLM调用（优先于对冲流程），端到端耗时约减半
+ENABLE_SINGLE_SHOT_ANALYSIS = os.getenv("ENABLE_SINGLE_SHOT_ANALYSIS", "false").lower() in ("1", "true", "yes")
+
+def _compile(flow):
+    """配置运行预算、时限与检查点存储后冻结流程，冻结后的流程在启动时构建一次，由所有请求线程共享"""
+    flow.deadline = FLOW_RETRY_BUDGET
+    flow.timeout = FLOW_TIMEOUT
+    flow.checkpoint_store = CHECKPOINT_STORE
+    return flow.freeze()
+
+BAZI_FLOW = _compile(create_bazi_only_flow())
+FENGSHUI_FLOW = _compile(create_fengshui_consultation_flow())
+
+def _create_complete_flow():
+    if ENABLE_SINGLE_SHOT_ANALYSIS:
+        return create_single_shot_fengshui_analysis_flow()
+    if ENABLE_LLM_HEDGING:
+        return create_hedged_fengshui_analysis_flow()
+    return create_fengshui_analysis_flow()
+
+COMPLETE_FLOW = _compile(_create_complete_flow())
+
+# 完整分析后台任务：在独立的有界线程池中运行，不占用Web服务线程；排队已满时返回503
+# 已完成任务的结果保留ANALYSIS_JOB_TTL秒，结果总大小超过ANALYSIS_JOB_MAX_MB时先淘汰最早完成的任务
+ANALYSIS_JOBS = JobQueue(
+    "analysis",
+    max_workers=int(os.getenv("ANALYSIS_JOB_WORKERS", "4")),
+    max_queued=int(os.getenv("ANALYSIS_JOB_MAX_QUEUED", "100")),
+    ttl=float(os.getenv("ANALYSIS_JOB_TTL", "600")),
+    max_bytes=int(float(os.getenv("ANALYSIS_JOB_MAX_MB", "64")) * 1024 * 1024)
+)
+JOB_RETRY_AFTER = 10
+
+# 命理分析预取：前端在 /api/bazi/basic 返回后总会紧接着请求 /api/bazi/analysis，
+# 八字算出后即在后台开始命理分析，后续的分析请求直接等待进行中或已完成的结果
+# 预取结果按八字签名保存ANALYSIS_PREFETCH_TTL秒；进行中的预取达到上限时不再预取，避免突发流量耗尽LLM配额
+ENABLE_ANALYSIS_PREFETCH = os.getenv("ENABLE_ANALYSIS_PREFETCH", "true").lower() in ("1", "true", "yes")
+ANALYSIS_PREFETCH_TTL = float(os.getenv("ANALYSIS_PREFETCH_TTL", "120"))
+ANALYSIS_PREFETCH_MAX_PENDING = int(os.getenv("ANALYSIS_PREFETCH_MAX_PENDING", "32"))
+_prefetch_pool = ThreadPoolExecutor(max_workers=int(os.getenv("ANALYSIS_PREFETCH_WORKERS", "4")),
+                                    thread_name_prefix="analysis-prefetch")
+_prefetched = {}  # 八字签名 -> (Future, 过期时间)
+_prefetch_lock = threading.Lock()
+
+def run_fortune_analysis(user_info, bazi_result):
+    """运行命理分析节点，返回姓名为占位符的分析结果（可在不同姓名的请求间共享）；同一八字的并发分析合并为一次"""
+    key = signature_key(bazi_result, user_info["gender"])
+    return single_flight("bazi_analysis").do(key, _fortune_analysis, user_info, bazi_result)
+
+def _fortune_analysis(user_info, bazi_result):
+    shared = {
+        "user_info": {**user_info, "name": NAME_PLACEHOLDER},
+        "bazi_result": bazi_result,
+        "service_type": "api_bazi_analysis"
+    }
+    # 通过run执行，使节点的重试策略与结果缓存生效
+    create_fortune_analysis_node().run(shared)
+    return shared["analysis_result"]
+
+def prefetch_fortune_analysis(user_info, bazi_result):
+    """在后台开始命理分析；同一八字已有预取或进行中的预取过多时跳过"""
+    key = signature_key(bazi_result, user_info["gender"])
+    now = time.monotonic()
+    with _prefetch_lock:
+        for k, (future, expires) in list(_prefetched.items()):
+            if expires < now and future.done():
+                del _prefetched[k]
+        pending = sum(not future.done() for future, _ in _prefetched.values())
+        if key in _prefetched or pending >= ANALYSIS_PREFETCH_MAX_PENDING:
+            return
+        future = _prefetch_pool.submit(run_fortune_analysis, user_info, bazi_result)
+        _prefetched[key] = (future, now + ANALYSIS_PREFETCH_TTL)
+
+def prefetched_fortune_analysis(user_info, bazi_result):
+    """取出同一八字的预取分析（进行中或未过期），没有时返回None"""
+    with _prefetch_lock:
+        entry = _prefetched.get(signature_key(bazi_result, user_info["gender"]))
+    if entry is None:
+        return None
+    future, expires = entry
+    if expires < time.monotonic() and future.done():
+        return None
+    return future
+
+def prefetch_stats():
+    with _prefetch_lock:
+        futures = [future for future, _ in _prefetched.values()]
+    return {"entries": len(futures), "pending": sum(not future.done() for future in futures)}
+
+def hedge_reports(flow):
+    """流程中对冲节点的对冲率、胜出次数与当前对冲延迟"""
+    return {type(node).__name__: node.hedge_report() for node in flow._graph() if isinstance(node, HedgedAsyncNode)}
+
+def _execute(flow, shared, run_id):
+    """同步流程直接运行；异步流程在当前请求线程中启动事件循环运行"""
+    if isinstance(flow, AsyncFlow):
+        return asyncio.run(flow.run_async(shared, run_id=run_id))
+    return flow.run(shared, run_id=run_id)
+
+def run_flow(flow, shared, name, run_id=None):
+    """运行流程，按需记录节点级耗时；提供run_id时每个节点完成后保存检查点"""
+    if run_id:
+        run_id = f"{name}:{run_id}"
+    if not FLOW_TRACE_DIR:
+        return _execute(flow, shared, run_id)
+    
+    # 共享的流程不能挂载单次请求的tracer，浅拷贝流程对象本身即可（节点仍然共享）
+    flow = copy.copy(flow)
+    flow.tracer = Tracer()
+    try:
+        return _execute(flow, shared, run_id)
+    finally:
+        os.makedirs(FLOW_TRACE_DIR, exist_ok=True)
+        trace_path = os.path.join(FLOW_TRACE_DIR, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.json")
+        with open(trace_path, "w", encoding="utf-8") as f:
+            f.write(flow.tracer.to_chrome_trace())
+        timings = ", ".join(f"{node}={ms:.0f}ms" for node, ms in flow.tracer.summary().items())
+        logger.info(f"流程 {name} 节点耗时: {timings} (trace: {trace_path})")
+
+# 准入控制：毫秒级接口与多秒级LLM接口分为两类，各自限制并发数和排队数，互不挤占服务线程
+# 排队已满立即返回429，排队超过等待时限返回503，均附带Retry-After；快速接口排队时限很短以保持低延迟
+ENDPOINT_CLASSES = {
+    "fast": {
+        "max_concurrent": int(os.getenv("ADMISSION_FAST_CONCURRENCY", "32")),
+        "max_queued": int(os.getenv("ADMISSION_FAST_QUEUE", "64")),
+        "timeout": float(os.getenv("ADMISSION_FAST_TIMEOUT", "0.5"))
+    },
+    "llm": {
+        "max_concurrent": int(os.getenv("ADMISSION_LLM_CONCURRENCY", "8")),
+        "max_queued": int(os.getenv("ADMISSION_LLM_QUEUE", "16")),
+        "timeout": float(os.getenv("ADMISSION_LLM_TIMEOUT", "10"))
+    }
+}
+
+class _HeldStream:
+    """流式响应的可迭代对象：响应发送完毕（或客户端断开）后才释放准入名额"""
+    
+    def __init__(self, iterable, release):
+        self.iterable, self._release = iterable, release
+    
+    def __iter__(self):
+        return iter(self.iterable)
+    
+    def close(self):
+        try:
+            if hasattr(self.iterable, "close"):
+                self.iterable.close()
+        finally:
+            release, self._release = self._release, None
+            if release:
+                release()
+
+def admit(endpoint_class):
+    """路由装饰器：请求先取得所属类别的并发名额再执行，类别饱和时快速失败"""
+    limits = ENDPOINT_CLASSES[endpoint_class]
+    pool = resource_pool(f"endpoint:{endpoint_class}", max_concurrent=limits["max_concurrent"],
+                         max_queued=limits["max_queued"])
+    retry_after = str(max(1, math.ceil(limits["timeout"])))
+    
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                pool.acquire(timeout=limits["timeout"])
+            except PoolSaturated as e:
+                logger.warning(f"{request.path} 请求被拒绝（{endpoint_class}类接口饱和: {e.reason}）")
+                return jsonify({
+                    "success": False,
+                    "error": "服务繁忙，请稍后重试"
+                }), 429 if e.reason == "queue_full" else 503, {"Retry-After": retry_after}
+            try:
+                response = view(*args, **kwargs)
+            except BaseException:
+                pool.release()
+                raise
+            if isinstance(response, Response) and response.is_streamed:
+                response.response = _HeldStream(response.response, pool.release)
+            else:
+                pool.release()
+            return response
+        return wrapper
+    return decorator
+
 @app.route('/api/health', methods=['GET'])
+@admit("fast")
 def health_check():
     """健康检查接口"""
     return jsonify({
         "status": "healthy",
         "message": "风水命理大师API服务运行正常",
+        "circuit_breakers": circuit_breaker_states(),
+        "resource_pools": resource_pool_stats(),
+        "llm_hedging": hedge_reports(COMPLETE_FLOW),
+        "analysis_cache": analysis_cache_stats(),
+        "analysis_prefetch": prefetch_stats(),
+        "analysis_jobs": ANALYSIS_JOBS.stats(),
+        "single_flight": single_flight_stats(),
         "timestamp": datetime.now().isoformat()
     })
 
+def _calculate_bazi_basic(shared):
+    from nodes import UserInfoCollectionNode, BaziCalculationNode
+    user_node = UserInfoCollectionNode()
+    bazi_node = BaziCalculationNode()
+    
+    # 手动执行节点，跳过LLM分析
+    user_prep = user_node.prep(shared)
+    user_exec = user_node.exec(user_prep)
+    user_node.post(shared, user_prep, user_exec)
+    
+    bazi_prep = bazi_node.prep(shared)
+    bazi_exec = bazi_node.exec(bazi_prep)
+    bazi_node.post(shared, bazi_prep, bazi_exec)
+    return shared
+
 @app.route('/api/bazi/basic', methods=['POST'])
+@admit("fast")
 def analyze_bazi_basic():
     """八字基础信息分析（快速响应）"""
     try:
@@ -64,19 +302,12 @@ def analyze_bazi_basic():
             "service_type": "api_bazi_basic"
         }
         
-        # 只运行用户信息收集和八字计算，不做LLM分析
-        from nodes import UserInfoCollectionNode, BaziCalculationNode
-        user_node = UserInfoCollectionNode()
-        bazi_node = BaziCalculationNode()
-        
-        # 手动执行节点，跳过LLM分析
-        user_prep = user_node.prep(shared)
-        user_exec = user_node.exec(user_prep)
-        user_node.post(shared, user_prep, user_exec)
+        # 只运行用户信息收集和八字计算，不做LLM分析；相同输入的并发请求共享一次计算
+        shared = single_flight("bazi_basic").do(stable_hash(shared["user_info"]), _calculate_bazi_basic, shared)
         
-        bazi_prep = bazi_node.prep(shared)
-        bazi_exec = bazi_node.exec(bazi_prep)
-        bazi_node.post(shared, bazi_prep, bazi_exec)
+        # 前端随后会请求命理分析，提前在后台开始
+        if ENABLE_ANALYSIS_PREFETCH:
+            prefetch_fortune_analysis(shared["user_info"], shared["bazi_result"])
         
         # 提取基础结果
         response_data = {
@@ -100,6 +331,7 @@ def analyze_bazi_basic():
         }), 500
 
 @app.route('/api/bazi/analysis', methods=['POST'])
+@admit("llm")
 def analyze_bazi_personality():
     """八字命理分析（LLM分析）"""
     try:
@@ -115,26 +347,33 @@ def analyze_bazi_personality():
                     "error": f"缺少必要字段: {field}"
                 }), 400
         
-        # 构造共享存储
-        shared = {
-            "user_info": data['user_info'],
-            "bazi_result": data['bazi_result'],
-            "service_type": "api_bazi_analysis"
-        }
-        
-        # 只运行LLM命理分析
-        from nodes import FortuneAnalysisNode
-        analysis_node = FortuneAnalysisNode()
+        user_info, bazi_result = data['user_info'], data['bazi_result']
         
-        analysis_prep = analysis_node.prep(shared)
-        analysis_exec = analysis_node.exec(analysis_prep)
-        analysis_node.post(shared, analysis_prep, analysis_exec)
+        # 优先使用 /api/bazi/basic 触发的预取结果：尚未开始则取消并在本请求中分析；已在进行则只等待它，
+        # 超时时返回504而不是再发起一次LLM调用（预取完成后写入分析缓存，重试即可命中）；预取失败时重新分析
+        analysis = None
+        future = prefetched_fortune_analysis(user_info, bazi_result)
+        if future is not None and not future.cancel():
+            # 用wait判断是否超时：预取流程自身抛出的TimeoutError（ExecTimeout/FlowTimeout）属于预取失败，应重新分析
+            if not wait([future], timeout=FLOW_TIMEOUT).done:
+                logger.warning("等待预取的命理分析超时")
+                return jsonify({
+                    "success": False,
+                    "error": "分析仍在进行，请稍后重试"
+                }), 504
+            try:
+                analysis = future.result()
+                logger.info("使用预取的命理分析")
+            except Exception as e:
+                logger.warning(f"预取的命理分析不可用，重新分析: {str(e)}")
+        if analysis is None:
+            analysis = run_fortune_analysis(user_info, bazi_result)
         
         # 提取分析结果
         response_data = {
             "success": True,
             "data": {
-                "analysis_result": shared.get("analysis_result")
+                "analysis_result": personalize(analysis, user_info['name'])
             },
             "timestamp": datetime.now().isoformat()
         }
@@ -151,6 +390,7 @@ def analyze_bazi_personality():
         }), 500
 
 @app.route('/api/bazi/analyze', methods=['POST'])
+@admit("llm")
 def analyze_bazi():
     """八字完整分析API接口（兼容性保留）"""
     try:
@@ -183,8 +423,7 @@ def analyze_bazi():
         }
         
         # 运行八字分析流程
-        flow = create_bazi_only_flow()
-        flow.run(shared)
+        run_flow(BAZI_FLOW, shared, "bazi")
         
         # 提取结果
         response_data = {
@@ -209,6 +448,7 @@ def analyze_bazi():
         }), 500
 
 @app.route('/api/fengshui/advice', methods=['POST'])
+@admit("llm")
 def get_fengshui_advice():
     """风水建议API接口"""
     try:
@@ -235,6 +475,16 @@ def get_fengshui_advice():
             logger.info("方位风水建议生成完成")
             return jsonify(response_data)
         
+        # 可只请求部分建议类型（如只要 ["home"]），未指定时生成全部类型
+        from nodes import FengshuiAdviceNode, FENGSHUI_ADVICE_TYPES
+        advice_types = data.get('advice_types')
+        if advice_types is not None and (not isinstance(advice_types, list)
+                                         or any(t not in FENGSHUI_ADVICE_TYPES for t in advice_types)):
+            return jsonify({
+                "success": False,
+                "error": f"advice_types 只能包含: {', '.join(FENGSHUI_ADVICE_TYPES)}"
+            }), 400
+        
         # 可以接收已有的八字信息，或重新计算（用于完整分析）
         if 'bazi_result' in data:
             # 使用已有八字结果
@@ -242,26 +492,21 @@ def get_fengshui_advice():
                 "user_info": data.get('user_info', {}),
                 "bazi_result": data['bazi_result'],
                 "analysis_result": data.get('analysis_result', {}),
+                "advice_types": advice_types,
                 "service_type": "api_fengshui"
             }
         else:
-            # 重新计算八字
+            # 重新计算八字，流程最后一个节点即生成风水建议
             shared = {
                 "user_info": data.get('user_info', {}),
+                "advice_types": advice_types,
                 "service_type": "api_fengshui"
             }
-            # 运行完整流程到风水建议
-            flow = create_fengshui_consultation_flow()
-            flow.run(shared)
-        
-        # 如果有完整八字信息，使用完整的风水建议
-        if 'bazi_result' in shared and 'analysis_result' in shared:
-            from nodes import FengshuiAdviceNode
-            fengshui_node = FengshuiAdviceNode()
-            
-            prep_data = fengshui_node.prep(shared)
-            advice = fengshui_node.exec(prep_data)
-            shared["fengshui_advice"] = advice
+            run_flow(FENGSHUI_FLOW, shared, "fengshui")
+        
+        # 使用已有八字结果时单独运行风水建议节点
+        if 'fengshui_advice' not in shared and 'bazi_result' in shared and 'analysis_result' in shared:
+            FengshuiAdviceNode().run(shared)
         
         response_data = {
             "success": True,
@@ -283,7 +528,14 @@ def get_fengshui_advice():
             "error": f"咨询过程出错: {str(e)}"
         }), 500
 
+def _traditional_daily_fortune(date, parsed_bazi):
+    from utils.traditional_calendar import get_traditional_fortune
+    daily_info = get_traditional_fortune(date, parsed_bazi)
+    daily_info["algorithm_type"] = "traditional"
+    return daily_info
+
 @app.route('/api/daily/fortune', methods=['GET'])
+@admit("fast")
 def get_daily_fortune_api():
     """每日运势API接口"""
     try:
@@ -321,11 +573,9 @@ def get_daily_fortune_api():
             except:
                 parsed_bazi = None
         
-        # 默认使用传统算法
+        # 默认使用传统算法；同一日期和八字的并发请求共享一次计算
         try:
-            from utils.traditional_calendar import get_traditional_fortune
-            daily_info = get_traditional_fortune(date, parsed_bazi)
-            daily_info["algorithm_type"] = "traditional"
+            daily_info = single_flight("daily_fortune").do(stable_hash((date, parsed_bazi)), _traditional_daily_fortune, date, parsed_bazi)
             logger.info(f"使用传统算法计算: {date}")
         except Exception as e:
             logger.error(f"传统算法失败: {str(e)}")
@@ -353,6 +603,7 @@ def get_daily_fortune_api():
         }), 500
 
 @app.route('/api/daily/auspicious', methods=['GET'])
+@admit("fast")
 def get_auspicious_days_api():
     """吉日查询API接口"""
     try:
@@ -391,7 +642,8 @@ def get_auspicious_days_api():
         logger.info(f"查询 {start_date} 到 {end_date} 的 {activity_type} 吉日")
         
         # 查找吉日
-        auspicious_days = find_auspicious_days(start_date, end_date, activity_type)
+        auspicious_days = single_flight("auspicious_days").do((start_date, end_date, activity_type), find_auspicious_days,
+                                                              start_date, end_date, activity_type)
         
         response_data = {
             "success": True,
@@ -417,7 +669,53 @@ def get_auspicious_days_api():
             "error": f"查询过程出错: {str(e)}"
         }), 500
 
+COMPLETE_REQUIRED_FIELDS = ['name', 'year', 'month', 'day', 'hour', 'gender', 'location']
+
+def _complete_shared(user_info):
+    """由请求中的用户信息构造完整分析的共享存储"""
+    return {
+        "user_info": {
+            "name": user_info['name'],
+            "birth_date": {
+                "year": int(user_info['year']),
+                "month": int(user_info['month']),
+                "day": int(user_info['day']),
+                "hour": int(user_info['hour'])
+            },
+            "gender": user_info['gender'],
+            "location": user_info['location']
+        },
+        "service_type": "api_complete"
+    }
+
+def _complete_result(shared):
+    """提取完整分析结果"""
+    return {
+        "user_info": shared.get("user_info"),
+        "bazi_result": shared.get("bazi_result"),
+        "analysis_result": shared.get("analysis_result"),
+        "fengshui_advice": shared.get("fengshui_advice"),
+        "daily_info": shared.get("daily_info"),
+        "final_report": shared.get("final_report")
+    }
+
+def _complete_run_id(data, shared):
+    """检查点的运行ID：客户端的run_id（或Idempotency-Key请求头）加上规范化用户信息的哈希，
+    复用或猜到他人的run_id也只能恢复与本次请求内容相同的检查点"""
+    run_id = data.get('run_id') or request.headers.get('Idempotency-Key')
+    if not run_id:
+        return None
+    return f"{run_id}:{stable_hash(shared['user_info'])}"
+
+def run_complete_analysis(shared, run_id=None):
+    """运行完整分析流程并返回结果；相同用户信息（和run_id）的并发请求共享一次运行"""
+    def run():
+        run_flow(COMPLETE_FLOW, shared, "complete", run_id=run_id)
+        return _complete_result(shared)
+    return single_flight("complete_analysis").do(stable_hash((shared["user_info"], run_id)), run)
+
 @app.route('/api/analyze/complete', methods=['POST'])
+@admit("llm")
 def complete_analysis():
     """完整分析API接口"""
     try:
@@ -425,10 +723,9 @@ def complete_analysis():
         logger.info(f"收到完整分析请求: {data.get('user_info', {}).get('name', 'Unknown')}")
         
         # 验证输入数据
-        required_fields = ['name', 'year', 'month', 'day', 'hour', 'gender', 'location']
         user_info = data.get('user_info', data)  # 兼容不同的数据格式
         
-        for field in required_fields:
+        for field in COMPLETE_REQUIRED_FIELDS:
             if field not in user_info:
                 return jsonify({
                     "success": False,
@@ -436,42 +733,28 @@ def complete_analysis():
                 }), 400
         
         # 构造共享存储
-        shared = {
-            "user_info": {
-                "name": user_info['name'],
-                "birth_date": {
-                    "year": int(user_info['year']),
-                    "month": int(user_info['month']),
-                    "day": int(user_info['day']),
-                    "hour": int(user_info['hour'])
-                },
-                "gender": user_info['gender'],
-                "location": user_info['location']
-            },
-            "service_type": "api_complete"
-        }
+        shared = _complete_shared(user_info)
         
-        # 运行完整分析流程
-        flow = create_fengshui_analysis_flow()
-        flow.run(shared)
+        # 运行完整分析流程；携带run_id重试时从检查点继续，不重复已完成的LLM分析
+        run_id = _complete_run_id(data, shared)
+        result = run_complete_analysis(shared, run_id)
         
         # 提取完整结果
         response_data = {
             "success": True,
-            "data": {
-                "user_info": shared.get("user_info"),
-                "bazi_result": shared.get("bazi_result"),
-                "analysis_result": shared.get("analysis_result"),
-                "fengshui_advice": shared.get("fengshui_advice"),
-                "daily_info": shared.get("daily_info"),
-                "final_report": shared.get("final_report")
-            },
+            "data": result,
             "timestamp": datetime.now().isoformat()
         }
         
         logger.info("完整分析完成")
         return jsonify(response_data)
         
+    except FlowTimeout as e:
+        logger.warning(f"完整分析超时: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": "分析超时，请使用相同的run_id重试以从检查点继续"
+        }), 504
     except Exception as e:
         logger.error(f"完整分析出错: {str(e)}")
         logger.error(traceback.format_exc())
@@ -480,6 +763,158 @@ def complete_analysis():
             "error": f"分析过程出错: {str(e)}"
         }), 500
 
+# 流式完整分析按节点完成顺序推送的结果段
+STREAM_SECTIONS = ("bazi_result", "daily_info", "fengshui_advice", "analysis_result", "final_report")
+
+def _iter_flow_events(flow, shared, run_id):
+    """逐个产出流程事件；异步流程在独立的事件循环中按需推进。迭代被放弃（客户端断开）时取消流程"""
+    if not isinstance(flow, AsyncFlow):
+        yield from flow.iter_events(shared, run_id=run_id)
+        return
+    loop = asyncio.new_event_loop()
+    events = flow.aiter_events(shared, run_id=run_id)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(events.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        loop.run_until_complete(events.aclose())
+        loop.close()
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.route('/api/analyze/stream', methods=['GET', 'POST'])
+@admit("llm")
+def stream_complete_analysis():
+    """
+    完整分析的Server-Sent Events接口：与 /api/analyze/complete 运行同一流程，
+    每个结果段（八字、日常信息、风水建议、命理分析、综合报告）在对应节点完成后立即推送，
+    最后推送 done 事件；出错时推送 error 事件。GET请求的参数放在查询字符串中（供EventSource使用）
+    """
+    data = request.get_json(silent=True) or request.args.to_dict()
+    user_info = data.get('user_info', data)  # 兼容不同的数据格式
+    
+    for field in COMPLETE_REQUIRED_FIELDS:
+        if field not in user_info:
+            return jsonify({
+                "success": False,
+                "error": f"缺少必要字段: {field}"
+            }), 400
+    
+    shared = _complete_shared(user_info)
+    run_id = _complete_run_id(data, shared)
+    if run_id:
+        run_id = f"complete:{run_id}"
+    logger.info(f"收到流式完整分析请求: {user_info['name']}")
+    
+    def generate():
+        sent = set()
+        try:
+            for event in _iter_flow_events(COMPLETE_FLOW, shared, run_id):
+                if event.kind != "node_finished":
+                    continue
+                # 每段只推送一次
+                for key in STREAM_SECTIONS:
+                    if key in event.data and key not in sent:
+                        sent.add(key)
+                        yield _sse(key, event.data[key])
+            # 从检查点恢复时，已完成的节点不再运行也不产生事件，其结果段在此补推
+            for key in STREAM_SECTIONS:
+                if key in shared and key not in sent:
+                    yield _sse(key, shared[key])
+            yield _sse("done", {"success": True, "timestamp": datetime.now().isoformat()})
+            logger.info("流式完整分析完成")
+        except FlowTimeout as e:
+            logger.warning(f"流式完整分析超时: {str(e)}")
+            yield _sse("error", {"success": False, "error": "分析超时，请使用相同的run_id重试以从检查点继续"})
+        except Exception as e:
+            logger.error(f"流式完整分析出错: {str(e)}")
+            logger.error(traceback.format_exc())
+            yield _sse("error", {"success": False, "error": f"分析过程出错: {str(e)}"})
+    
+    # 关闭代理缓冲，确保每个事件立即送达客户端
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _run_complete_job(shared, run_id):
+    """后台任务：运行完整分析流程并返回结果"""
+    try:
+        return run_complete_analysis(shared, run_id)
+    except FlowTimeout:
+        raise RuntimeError("分析超时，请使用相同的run_id重新提交以从检查点继续")
+    except Exception:
+        logger.error(traceback.format_exc())
+        raise
+
+@app.route('/api/analyze/jobs', methods=['POST'])
+@admit("fast")
+def submit_complete_analysis_job():
+    """提交完整分析任务，立即返回任务ID，通过 /api/analyze/jobs/<job_id> 查询结果"""
+    try:
+        data = request.get_json()
+        user_info = data.get('user_info', data)  # 兼容不同的数据格式
+        
+        for field in COMPLETE_REQUIRED_FIELDS:
+            if field not in user_info:
+                return jsonify({
+                    "success": False,
+                    "error": f"缺少必要字段: {field}"
+                }), 400
+        
+        shared = _complete_shared(user_info)
+        run_id = _complete_run_id(data, shared)
+        job_id = ANALYSIS_JOBS.submit(_run_complete_job, shared, run_id)
+        logger.info(f"完整分析任务已提交: {job_id}")
+        
+        return jsonify({
+            "success": True,
+            "data": {
+                "job_id": job_id,
+                "status": "queued",
+                "status_url": f"/api/analyze/jobs/{job_id}"
+            },
+            "timestamp": datetime.now().isoformat()
+        }), 202
+        
+    except JobQueueFull as e:
+        logger.warning(f"完整分析任务排队已满: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": "分析任务繁忙，请稍后重试"
+        }), 503, {"Retry-After": str(JOB_RETRY_AFTER)}
+    except Exception as e:
+        logger.error(f"提交完整分析任务出错: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({
+            "success": False,
+            "error": f"提交分析任务出错: {str(e)}"
+        }), 500
+
+@app.route('/api/analyze/jobs/<job_id>', methods=['GET'])
+@admit("fast")
+def get_complete_analysis_job(job_id):
+    """查询完整分析任务：status 为 queued/running/done/failed，完成后附带结果"""
+    job = ANALYSIS_JOBS.get(job_id)
+    if job is None:
+        return jsonify({
+            "success": False,
+            "error": "任务不存在或结果已过期"
+        }), 404
+    
+    return jsonify({
+        "success": job["status"] != "failed",
+        "data": {
+            "job_id": job_id,
+            "status": job["status"],
+            "result": job["result"],
+            "error": job["error"]
+        },
+        "timestamp": datetime.now().isoformat()
+    })
+
 @app.errorhandler(404)
 def not_found(error):
     """404错误处理"""
@@ -492,7 +927,9 @@ def not_found(error):
             "/api/fengshui/advice", 
             "/api/daily/fortune",
             "/api/daily/auspicious",
-            "/api/analyze/complete"
+            "/api/analyze/complete",
+            "/api/analyze/jobs",
+            "/api/analyze/stream"
         ]
     }), 404
 
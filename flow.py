@@ -3,14 +3,20 @@
 连接各个节点形成完整的分析流程
 """
 
-from macore import Flow
+from macore import Flow, DagFlow, AsyncDagFlow
 from nodes import (
     UserInfoCollectionNode,
     BaziCalculationNode, 
-    FortuneAnalysisNode,
     FengshuiAdviceNode,
     DailyQueryNode,
-    ResultIntegrationNode
+    ResultIntegrationNode,
+    HedgedFortuneAnalysisNode,
+    HedgedResultIntegrationNode,
+    SingleShotAnalysisNode,
+    ReportAssemblyNode,
+    CohortRecomputeNode,
+    FragmentPrecomputeNode,
+    create_fortune_analysis_node
 )
 
 def create_fengshui_analysis_flow():
@@ -19,17 +25,49 @@ def create_fengshui_analysis_flow():
     # 创建各个节点实例
     user_input = UserInfoCollectionNode()
     bazi_calc = BaziCalculationNode()
-    fortune_analysis = FortuneAnalysisNode()
+    fortune_analysis = create_fortune_analysis_node()
     fengshui_advice = FengshuiAdviceNode()
     daily_query = DailyQueryNode()
     result_integration = ResultIntegrationNode()
     
-    # 连接节点形成流程
-    # 用户信息收集 -> 八字计算 -> 命理分析 -> 风水建议 -> 日常查询 -> 结果整合
-    user_input >> bazi_calc >> fortune_analysis >> fengshui_advice >> daily_query >> result_integration
-    
-    # 创建并返回流程
-    return Flow(start=user_input)
+    # 按节点声明的读写键推导依赖，形成DAG流程
+    # 用户信息收集 -> 八字计算 -> ┬ 命理分析 -> 风水建议 ┬ -> 结果整合
+    #                             └ 日常查询 ────────────┘
+    # 日常查询只依赖用户信息和八字，与LLM命理分析链并行执行
+    return DagFlow([
+        user_input,
+        bazi_calc,
+        fortune_analysis,
+        fengshui_advice,
+        daily_query,
+        result_integration
+    ])
+
+def create_hedged_fengshui_analysis_flow():
+    """创建完整分析流程的异步版本：两个LLM节点使用对冲请求压低尾延迟，同步节点在线程池中执行"""
+    
+    return AsyncDagFlow([
+        UserInfoCollectionNode(),
+        BaziCalculationNode(),
+        HedgedFortuneAnalysisNode(),
+        FengshuiAdviceNode(),
+        DailyQueryNode(),
+        HedgedResultIntegrationNode()
+    ])
+
+def create_single_shot_fengshui_analysis_flow():
+    """创建完整分析流程的单次LLM调用版本：命理分析与综合报告合并为一次LLM调用"""
+    
+    # 用户信息收集 -> 八字计算 -> 日常查询 -> 命理分析+摘要报告（LLM） -> 风水建议 -> 报告组装
+    # 日常查询只需毫秒级，提前执行以便摘要报告引用当日运势；报告组装不再调用LLM
+    return DagFlow([
+        UserInfoCollectionNode(),
+        BaziCalculationNode(),
+        DailyQueryNode(),
+        SingleShotAnalysisNode(),
+        FengshuiAdviceNode(),
+        ReportAssemblyNode()
+    ])
 
 def create_quick_daily_flow():
     """创建快速每日运势查询流程（已有用户信息的情况）"""
@@ -43,7 +81,7 @@ def create_bazi_only_flow():
     
     user_input = UserInfoCollectionNode()
     bazi_calc = BaziCalculationNode()
-    fortune_analysis = FortuneAnalysisNode()
+    fortune_analysis = create_fortune_analysis_node()
     
     # 简化流程：用户输入 -> 八字计算 -> 命理分析
     user_input >> bazi_calc >> fortune_analysis
@@ -55,7 +93,7 @@ def create_fengshui_consultation_flow():
     
     user_input = UserInfoCollectionNode()
     bazi_calc = BaziCalculationNode()
-    fortune_analysis = FortuneAnalysisNode()
+    fortune_analysis = create_fortune_analysis_node()
     fengshui_advice = FengshuiAdviceNode()
     
     # 风水咨询流程
@@ -63,6 +101,20 @@ def create_fengshui_consultation_flow():
     
     return Flow(start=user_input)
 
+def create_cohort_recompute_flow(fortune_date=None, max_workers=None):
+    """创建客户群夜间批量重算流程（多进程，按CPU核数扩展）"""
+    
+    cohort_recompute = CohortRecomputeNode(fortune_date=fortune_date, max_workers=max_workers)
+    
+    return Flow(start=cohort_recompute)
+
+def create_fragment_precompute_flow(max_workers=8):
+    """创建命理分析片段离线预生成流程（多线程并发调用LLM）"""
+    
+    fragment_precompute = FragmentPrecomputeNode(max_workers=max_workers)
+    
+    return Flow(start=fragment_precompute)
+
 if __name__ == "__main__":
     """测试流程创建"""
     
@@ -288,6 +288,7 @@ export const getFengshuiAdvice = async (data: {
   user_info?: UserInfo;
   bazi_result?: BaziResult;
   analysis_result?: AnalysisResult;
+  advice_types?: Array<'general' | 'home' | 'career' | 'relationship'>;
   query?: {
     type: string;
     direction?: string;
@@ -387,6 +388,46 @@ export const completeAnalysis = async (userInfo: UserInfo) => {
   }
 };
 
+/**
+ * 流式完整分析
+ * 各结果段（bazi_result、daily_info、fengshui_advice、analysis_result、final_report）完成后立即回调 onSection
+ */
+export const streamCompleteAnalysis = async (
+  userInfo: UserInfo,
+  onSection: (section: string, data: any) => void
+) => {
+  const response = await fetch(`${API_BASE_URL}/api/analyze/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ user_info: userInfo }),
+  });
+  if (!response.ok || !response.body) {
+    const body = await response.json().catch(() => null);
+    throw new Error(body?.error || '完整分析失败，请检查网络连接');
+  }
+
+  // 按Server-Sent Events格式拆分事件：event行为结果段名称，data行为JSON数据
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const message = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const event = message.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(message.match(/^data: (.*)$/m)?.[1] ?? 'null');
+      if (event === 'error') throw new Error(data?.error || '分析失败');
+      if (event === 'done') return;
+      if (event) onSection(event, data);
+    }
+  }
+  throw new Error('分析连接中断，请重试');
+};
+
 /**
  * 检查API连接状态
  */
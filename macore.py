@@ -3,21 +3,420 @@
 MACore Framework - MACore Application Framework
 A lightweight framework for building LLM applications with nodes and flows.
 """
-import asyncio, warnings, copy, time
+import asyncio, warnings, copy, time, threading, hashlib, json, pickle, sqlite3, contextvars, contextlib, itertools, os, random, queue
+from collections import OrderedDict, namedtuple, deque
+from types import MappingProxyType
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait as _wait, TimeoutError as FuturesTimeout
+
+_tracer=contextvars.ContextVar("macore_tracer",default=None)
+_span_id=contextvars.ContextVar("macore_span",default=None)
+_deadline=contextvars.ContextVar("macore_deadline",default=None)  # time.monotonic() by which the innermost flow must finish
+_checkpoint_run=contextvars.ContextVar("macore_checkpoint_run",default=None)  # (flow, run_id) given to Flow.run
+_run_params=contextvars.ContextVar("macore_run_params",default=None)  # params of frozen nodes for the current run
+_retry_attempt=contextvars.ContextVar("macore_retry_attempt",default=0)  # retry_attempt of frozen nodes for the current exec
+_event_sink=contextvars.ContextVar("macore_event_sink",default=None)  # callable receiving FlowEvents, set by Flow.iter_events
+_timeout_at=contextvars.ContextVar("macore_timeout_at",default=None)  # time.monotonic() at which the innermost flow is aborted
+_cancel_token=contextvars.ContextVar("macore_cancel_token",default=None)  # CancelToken given to Flow.run
+
+class Tracer:
+    """Records nested timing spans (flow run > node > prep/exec/post) plus retry/fallback/cache events.
+    Attach to a flow with Flow(tracer=...); every run of that flow and its sub-flows is recorded."""
+    def __init__(self): self.spans,self.events,self._ids,self._lock=[],[],itertools.count(1),threading.Lock()
+    @contextlib.contextmanager
+    def span(self,name,**attrs):
+        s={"id":next(self._ids),"parent":_span_id.get(),"name":name,"start":time.perf_counter(),"end":None,"thread":threading.get_ident(),"attrs":attrs}
+        with self._lock: self.spans.append(s)
+        tok=_span_id.set(s["id"])
+        try: yield s
+        except BaseException as e: s["attrs"]["error"]=repr(e); raise
+        finally: s["end"]=time.perf_counter(); _span_id.reset(tok)
+    def event(self,name,**attrs):
+        with self._lock: self.events.append({"span":_span_id.get(),"name":name,"time":time.perf_counter(),"attrs":attrs})
+    def clear(self):
+        with self._lock: self.spans.clear(); self.events.clear()
+    def _origin(self): return min((s["start"] for s in self.spans),default=0.0)
+    def to_dict(self):
+        t0,nodes=self._origin(),{}
+        for s in self.spans: nodes[s["id"]]={"name":s["name"],"start_ms":(s["start"]-t0)*1e3,"duration_ms":((s["end"] or time.perf_counter())-s["start"])*1e3,"attrs":s["attrs"],"events":[],"children":[]}
+        for e in self.events:
+            if e["span"] in nodes: nodes[e["span"]]["events"].append({"name":e["name"],"at_ms":(e["time"]-t0)*1e3,"attrs":e["attrs"]})
+        roots=[]
+        for s in self.spans: (nodes[s["parent"]]["children"] if s["parent"] in nodes else roots).append(nodes[s["id"]])
+        return {"spans":roots}
+    def to_json(self,**kw): return json.dumps(self.to_dict(),ensure_ascii=False,default=repr,**kw)
+    def to_chrome_trace(self,**kw):
+        t0,pid=self._origin(),os.getpid()
+        ev=[{"name":s["name"],"ph":"X","ts":(s["start"]-t0)*1e6,"dur":((s["end"] or time.perf_counter())-s["start"])*1e6,"pid":pid,"tid":s["thread"],"args":s["attrs"]} for s in self.spans]
+        tids={s["id"]:s["thread"] for s in self.spans}
+        ev+=[{"name":e["name"],"ph":"i","s":"t","ts":(e["time"]-t0)*1e6,"pid":pid,"tid":tids.get(e["span"],0),"args":e["attrs"]} for e in self.events]
+        return json.dumps({"traceEvents":ev},ensure_ascii=False,default=repr,**kw)
+    def summary(self):
+        """Wall-clock milliseconds per node span name, summed over the recorded runs."""
+        out={}
+        for s in self.spans:
+            if s["attrs"].get("kind")=="node": out[s["name"]]=out.get(s["name"],0.0)+((s["end"] or time.perf_counter())-s["start"])*1e3
+        return out
+
+def _span(name,**attrs):
+    t=_tracer.get(); return t.span(name,**attrs) if t is not None else contextlib.nullcontext({"attrs":{}})
+def _trace_event(name,**attrs):
+    t=_tracer.get()
+    if t is not None: t.event(name,**attrs)
+
+FlowEvent=namedtuple("FlowEvent","kind node data")  # kind: node_started / node_finished (data: shared keys it set) / flow_done (data: {"action"})
+
+def _shared_delta(node,shared,before):
+    """The node's declared `writes`; nodes without declared writes get every top-level key added or rebound during their run
+    (which, in a DagFlow, may include keys set concurrently by sibling nodes)."""
+    if node.writes: return {k:shared[k] for k in node.writes if k in shared}
+    return {k:v for k,v in dict(shared).items() if k not in before or before[k] is not v}
+@contextlib.contextmanager
+def _node_events(node,shared):
+    sink=_event_sink.get()
+    if sink is None: yield; return
+    name,before=type(node).__name__,dict(shared); sink(FlowEvent("node_started",name,None))
+    yield
+    sink(FlowEvent("node_finished",name,_shared_delta(node,shared,before)))
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per second (bursts up to `burst`).
+    Reservations are granted in arrival order, so waiters are served first-come first-served."""
+    def __init__(self,rate,burst=1): self.rate,self.burst,self.tokens,self.stamp,self._lock=rate,burst,burst,time.monotonic(),threading.Lock()
+    def reserve(self):
+        """Take a token now and return how long the caller must wait before using it."""
+        with self._lock:
+            now=time.monotonic(); self.tokens=min(self.burst,self.tokens+(now-self.stamp)*self.rate); self.stamp=now; self.tokens-=1
+            return max(0.0,-self.tokens/self.rate)
+    def acquire(self):
+        d=self.reserve()
+        if d>0: time.sleep(d)
+        return d
+    async def acquire_async(self):
+        d=self.reserve()
+        if d>0: await asyncio.sleep(d)
+        return d
+
+async def _bounded_map(fn,items,limit=None,rate=None,ordered=False):
+    """Await fn(item) for every item with at most `limit` in flight and at most `rate` starts per second.
+    Yields (index,result) as calls finish, or in input order when `ordered`; the first error cancels the rest."""
+    items=list(items); it,q,limiter=iter(enumerate(items)),asyncio.Queue(),(RateLimiter(rate) if rate else None)
+    async def worker():
+        for i,x in it:
+            if limiter: await limiter.acquire_async()
+            try: q.put_nowait((i,await fn(x),None))
+            except Exception as e: q.put_nowait((i,None,e)); return
+    workers=[asyncio.ensure_future(worker()) for _ in range(min(len(items),limit or len(items)))]
+    try:
+        pending,nxt={},0
+        for _ in range(len(items)):
+            i,r,e=await q.get()
+            if e is not None: raise e
+            if not ordered: yield i,r; continue
+            pending[i]=r
+            while nxt in pending: yield nxt,pending.pop(nxt); nxt+=1
+    finally:
+        for w in workers: w.cancel()
+
+_process_pool,_process_pool_lock=None,threading.Lock()
+def default_process_pool():
+    """Process pool shared by async flows for nodes declaring executor="process" (created on first use)."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None: _process_pool=ProcessPoolExecutor()
+        return _process_pool
+
+class CircuitOpenError(RuntimeError):
+    """Raised (and handed to exec_fallback) when a node's circuit breaker short-circuits a call."""
+
+class PoolSaturated(RuntimeError):
+    """Raised by ResourcePool.acquire when its wait queue is full (reason "queue_full") or the wait times out ("timeout")."""
+    def __init__(self,pool,reason): super().__init__(f"resource pool {pool!r} saturated: {reason}"); self.pool,self.reason=pool,reason
+
+class ExecTimeout(TimeoutError):
+    """A sync exec attempt overran the node `timeout`. Its thread cannot be stopped and keeps running, so it is never retried."""
+
+class FlowCancelled(Exception):
+    """Raised out of a run whose CancelToken fired. Never retried or handed to exec_fallback."""
+
+class FlowTimeout(FlowCancelled,TimeoutError):
+    """Raised out of a run that exceeded its flow timeout."""
+
+class CancelToken:
+    """Cooperative cancellation for a run, e.g. fired by a request handler when the client disconnects.
+    Sync flows check it between nodes and retry attempts; async flows also cancel their running task, aborting in-flight awaits."""
+    def __init__(self): self.reason,self._event,self._callbacks,self._lock=None,threading.Event(),[],threading.Lock()
+    @property
+    def cancelled(self): return self._event.is_set()
+    def cancel(self,reason="cancelled"):
+        with self._lock:
+            if self._event.is_set(): return
+            self.reason,cbs,self._callbacks=reason,self._callbacks,[]; self._event.set()
+        for cb in cbs: cb()
+    def on_cancel(self,cb):
+        """Call cb() once when cancelled (now, if already cancelled). Returns a function that unregisters it."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(cb)
+                def unregister():
+                    with self._lock:
+                        if cb in self._callbacks: self._callbacks.remove(cb)
+                return unregister
+        cb(); return lambda: None
+    def wait(self,timeout=None): return self._event.wait(timeout)
+    def raise_if_cancelled(self):
+        if self.cancelled: raise FlowCancelled(self.reason)
+
+def current_cancel_token():
+    """The CancelToken of the run executing the calling node, or None; long exec() bodies can poll it."""
+    return _cancel_token.get()
+def _check_cancelled():
+    tok,end=_cancel_token.get(),_timeout_at.get()
+    if tok is not None: tok.raise_if_cancelled()
+    if end is not None and time.monotonic()>=end: raise FlowTimeout("flow timeout exceeded")
+def _narrow(var,seconds):
+    """Set a monotonic end-time var to now+seconds unless an enclosing flow already ends sooner; returns the reset token."""
+    if seconds is None: return None
+    end,outer=time.monotonic()+seconds,var.get()
+    return var.set(end if outer is None else min(end,outer))
+def _sleep(seconds):
+    tok=_cancel_token.get()
+    if tok is None: time.sleep(seconds)
+    else: tok.wait(seconds)
+    _check_cancelled()
+@contextlib.contextmanager
+def _cancel_scope():
+    """Inside an async flow: cancel the current task when the run's token fires or the flow timeout passes,
+    surfacing FlowCancelled/FlowTimeout instead of CancelledError."""
+    tok,end=_cancel_token.get(),_timeout_at.get()
+    if tok is None and end is None: yield; return
+    task,loop,why,active=asyncio.current_task(),asyncio.get_running_loop(),[],[True]
+    def stop(exc):
+        if active[0] and not why: why.append(exc); task.cancel()
+    h=loop.call_at(loop.time()+end-time.monotonic(),stop,FlowTimeout("flow timeout exceeded")) if end is not None else None
+    unregister=tok.on_cancel(lambda: loop.call_soon_threadsafe(stop,FlowCancelled(tok.reason))) if tok is not None else (lambda: None)
+    try: yield
+    except asyncio.CancelledError:
+        if not why: raise
+        raise why[0] from None
+    finally:
+        active[0]=False; unregister()
+        if h is not None: h.cancel()
+        if why and hasattr(task,"uncancel"): task.uncancel()
+def _call_with_timeout(fn,arg,timeout,error,on_exit=None):
+    """fn(arg) on a helper thread, raising error once timeout passes. The thread cannot be killed and is abandoned;
+    on_exit runs when it really finishes, so whatever it holds is released then rather than when the caller gives up."""
+    fut,ctx=Future(),contextvars.copy_context()
+    def work():
+        try: fut.set_result(ctx.run(fn,arg))
+        except BaseException as e: fut.set_exception(e)
+        finally:
+            if on_exit is not None: on_exit()
+    try: threading.Thread(target=work,daemon=True).start()
+    except BaseException:
+        if on_exit is not None: on_exit()
+        raise
+    try: fut.exception(max(timeout,0))  # waits without raising fn's own error (TimeoutError is FuturesTimeout on 3.11+)
+    except FuturesTimeout: raise error(f"{getattr(fn,'__qualname__',fn)} timed out after {timeout:.2f}s") from None
+    return fut.result()
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` failures (errors, or calls slower than `slow_call_seconds`) within `window` seconds.
+    While open, calls are refused for `reset_timeout` seconds; then half_open admits one probe whose outcome closes or re-opens it."""
+    def __init__(self,name="default",failure_threshold=5,window=60,slow_call_seconds=None,reset_timeout=30):
+        self.name,self.failure_threshold,self.window,self.slow_call_seconds,self.reset_timeout=name,failure_threshold,window,slow_call_seconds,reset_timeout
+        self.state,self._failures,self._opened_at,self._probe_at,self._lock="closed",deque(),0.0,None,threading.Lock()
+        self.counts={"success":0,"failure":0,"slow":0,"rejected":0,"opened":0}
+    def allow(self):
+        with self._lock:
+            now=time.monotonic()
+            if self.state=="open" and now-self._opened_at>=self.reset_timeout: self.state,self._probe_at="half_open",None
+            if self.state=="closed": return True
+            if self.state=="half_open" and (self._probe_at is None or now-self._probe_at>=self.reset_timeout): self._probe_at=now; return True
+            self.counts["rejected"]+=1; return False
+    def record(self,ok,duration=0.0):
+        with self._lock:
+            now,slow=time.monotonic(),self.slow_call_seconds is not None and duration>self.slow_call_seconds
+            if slow: self.counts["slow"]+=1
+            if ok and not slow:
+                self.counts["success"]+=1
+                if self.state=="half_open": self.state,self._failures=("closed",deque())
+                return
+            self.counts["failure"]+=int(not ok); self._failures.append(now)
+            while self._failures and now-self._failures[0]>self.window: self._failures.popleft()
+            if self.state=="half_open" or (self.state=="closed" and len(self._failures)>=self.failure_threshold): self._open(now)
+    def _open(self,now): self.state,self._opened_at,self._probe_at=("open",now,None); self.counts["opened"]+=1
+    def snapshot(self):
+        with self._lock:
+            st={"state":self.state,"recent_failures":len(self._failures),**self.counts}
+            if self.state=="open": st["retry_in"]=max(0.0,self.reset_timeout-(time.monotonic()-self._opened_at))
+            return st
+
+_breakers,_breakers_lock={},threading.Lock()
+def circuit_breaker(name,**kwargs):
+    """Process-wide breaker registry: the first call creates `name` with kwargs, later calls return the same instance."""
+    with _breakers_lock:
+        if name not in _breakers: _breakers[name]=CircuitBreaker(name,**kwargs)
+        return _breakers[name]
+def circuit_breaker_states(): return {n:b.snapshot() for n,b in list(_breakers.items())}
+
+class ResourcePool:
+    """Process-wide limit on a shared external resource: at most max_concurrent holders and rate_per_minute acquisitions.
+    Waiters from every thread and event loop are admitted first-come first-served; wait times are recorded in stats.
+    With max_queued, acquisitions beyond that many waiters fail fast with PoolSaturated instead of queueing."""
+    def __init__(self,name,max_concurrent=None,rate_per_minute=None,burst=1,max_queued=None):
+        self.name,self.max_concurrent,self.rate_per_minute,self.max_queued=name,max_concurrent,rate_per_minute,max_queued
+        self._limiter=RateLimiter(rate_per_minute/60,burst) if rate_per_minute else None
+        self._lock,self._waiters,self.active=threading.Lock(),deque(),0
+        self.stats={"acquired":0,"waited":0,"total_wait":0.0,"max_wait":0.0,"rejected":0,"timed_out":0}
+    def _admit(self,wake):
+        """Take a slot now (True) or queue `wake` to be called when one is handed over (False)."""
+        with self._lock:
+            if not self._waiters and (self.max_concurrent is None or self.active<self.max_concurrent): self.active+=1; return True
+            if self.max_queued is not None and len(self._waiters)>=self.max_queued:
+                self.stats["rejected"]+=1; raise PoolSaturated(self.name,"queue_full")
+            self._waiters.append(wake); return False
+    def _timed_out(self,wake):
+        """A queued waiter gave up; raises PoolSaturated unless a slot was handed over meanwhile."""
+        if self._withdraw(wake):
+            with self._lock: self.stats["timed_out"]+=1
+            raise PoolSaturated(self.name,"timeout")
+    def _withdraw(self,wake):
+        """Drop a queued waiter; False means it was already handed a slot, which the caller now owns."""
+        with self._lock:
+            if wake in self._waiters: self._waiters.remove(wake); return True
+            return False
+    def release(self):
+        with self._lock:
+            if self._waiters: wake=self._waiters.popleft()  # hand the slot over; active is unchanged
+            else: self.active-=1; return
+        wake()
+    def _record(self,t0):
+        w=time.monotonic()-t0
+        with self._lock:
+            self.stats["acquired"]+=1; self.stats["total_wait"]+=w; self.stats["max_wait"]=max(self.stats["max_wait"],w)
+            if w>0.001: self.stats["waited"]+=1
+        if w>0.001: _trace_event("resource_wait",pool=self.name,wait=w)
+    def acquire(self,timeout=None):
+        """Wait for a slot (at most `timeout` seconds in the queue, then PoolSaturated)."""
+        t0,ev=time.monotonic(),threading.Event()
+        if not self._admit(ev.set):
+            try:
+                while not ev.wait(0.1 if timeout is None else min(0.1,max(0.0,t0+timeout-time.monotonic()))):
+                    _check_cancelled()
+                    if timeout is not None and time.monotonic()-t0>=timeout: self._timed_out(ev.set); break
+            except PoolSaturated: raise
+            except BaseException:
+                if not self._withdraw(ev.set): self.release()
+                raise
+        try:
+            if self._limiter is not None and (d:=self._limiter.reserve())>0: _sleep(d)
+        except BaseException: self.release(); raise
+        self._record(t0)
+    async def acquire_async(self,timeout=None):
+        t0,loop=time.monotonic(),asyncio.get_running_loop(); fut=loop.create_future()
+        wake=lambda: loop.call_soon_threadsafe(lambda: fut.done() or fut.set_result(None))
+        if not self._admit(wake):
+            try: await asyncio.wait_for(fut,timeout)
+            except asyncio.TimeoutError: self._timed_out(wake)
+            except BaseException:
+                if not self._withdraw(wake): self.release()
+                raise
+        try:
+            if self._limiter is not None: await self._limiter.acquire_async()
+        except BaseException: self.release(); raise
+        self._record(t0)
+    @contextlib.contextmanager
+    def hold(self,timeout=None):
+        self.acquire(timeout)
+        try: yield self
+        finally: self.release()
+    @contextlib.asynccontextmanager
+    async def hold_async(self,timeout=None):
+        await self.acquire_async(timeout)
+        try: yield self
+        finally: self.release()
+    def snapshot(self):
+        with self._lock:
+            st=dict(self.stats); st.update(active=self.active,queued=len(self._waiters),max_concurrent=self.max_concurrent,rate_per_minute=self.rate_per_minute,max_queued=self.max_queued)
+        st["avg_wait"]=st["total_wait"]/st["acquired"] if st["acquired"] else 0.0; return st
+
+_pools,_pools_lock={},threading.Lock()
+def resource_pool(name,**kwargs):
+    """Process-wide pool registry: the first call creates `name` with kwargs (unlimited if none), later calls return the same instance."""
+    with _pools_lock:
+        if name not in _pools: _pools[name]=ResourcePool(name,**kwargs)
+        return _pools[name]
+def resource_pool_stats(): return {n:p.snapshot() for n,p in list(_pools.items())}
+def _pools_for(resources):
+    """Pools for a node's `resources` (names or ResourcePools), in name order so multi-pool holders cannot deadlock."""
+    return sorted((r if isinstance(r,ResourcePool) else resource_pool(r) for r in resources),key=lambda p: p.name)
+class SingleFlight:
+    """Coalesces concurrent calls sharing a key: the first caller runs fn, callers arriving while it runs wait for
+    and receive the same result (or exception). Nothing is kept once the call finishes; pair with a cache for reuse."""
+    def __init__(self,name):
+        self.name,self._lock,self._calls=name,threading.Lock(),{}
+        self.stats={"calls":0,"shared":0}
+    def do(self,key,fn,*args,**kwargs):
+        with self._lock:
+            self.stats["calls"]+=1; fut=self._calls.get(key); leader=fut is None
+            if leader: fut=self._calls[key]=Future()
+            else: self.stats["shared"]+=1
+        if not leader: return fut.result()
+        try: res=fn(*args,**kwargs)
+        except BaseException as e: fut.set_exception(e); raise
+        else: fut.set_result(res); return res
+        finally:
+            with self._lock: del self._calls[key]
+    def snapshot(self):
+        with self._lock: return {**self.stats,"in_flight":len(self._calls)}
+_flights,_flights_lock={},threading.Lock()
+def single_flight(name):
+    """Process-wide SingleFlight registry: calls with the same name return the same instance."""
+    with _flights_lock:
+        if name not in _flights: _flights[name]=SingleFlight(name)
+        return _flights[name]
+def single_flight_stats(): return {n:f.snapshot() for n,f in list(_flights.items())}
+@contextlib.contextmanager
+def _holding(resources):
+    with contextlib.ExitStack() as stack:
+        for p in _pools_for(resources): stack.enter_context(p.hold())
+        yield stack
+@contextlib.asynccontextmanager
+async def _holding_async(resources):
+    async with contextlib.AsyncExitStack() as stack:
+        for p in _pools_for(resources): await stack.enter_async_context(p.hold_async())
+        yield
 
 class BaseNode:
+    reads,writes=(),()  # shared-store keys consumed/produced, used by DagFlow to derive dependencies
+    executor=None  # how async flows run this sync node: None/"thread" (the flow's sync_executor), "process", "inline" (on the loop) or an Executor
+    frozen=False  # set by Flow.freeze(); per-run state then lives in the run context instead of the instance
     def __init__(self): 
         self.params = {}
         self.successors = {}
+    @property
+    def params(self):
+        p=_run_params.get() if self.frozen else None
+        return self._params if p is None else p
+    @params.setter
+    def params(self,params):
+        if self.frozen: raise RuntimeError(f"{type(self).__name__} is frozen; params come from the running flow")
+        self._params=params
     def set_params(self,params): self.params=params
     def next(self,node,action="default"):
+        if self.frozen: raise RuntimeError(f"{type(self).__name__} is frozen; build the graph before Flow.freeze()")
         if action in self.successors: warnings.warn(f"Overwriting successor for action '{action}'")
         self.successors[action]=node; return node
     def prep(self,shared): pass
     def exec(self,prep_res): pass
     def post(self,shared,prep_res,exec_res): pass
     def _exec(self,prep_res): return self.exec(prep_res)
-    def _run(self,shared): p=self.prep(shared); e=self._exec(p); return self.post(shared,p,e)
+    def _run(self,shared):
+        with _node_events(self,shared),_span(type(self).__name__,kind="node") as s:
+            with _span("prep"): p=self.prep(shared)
+            with _span("exec"): e=self._exec(p)
+            with _span("post"): s["attrs"]["action"]=a=self.post(shared,p,e)
+            return a
     def run(self,shared): 
         if self.successors: warnings.warn("Node won't run successors. Use Flow.")  
         return self._run(shared)
@@ -30,38 +429,362 @@ class _ConditionalTransition:
     def __init__(self,src,action): self.src,self.action=src,action
     def __rshift__(self,tgt): return self.src.next(tgt,self.action)
 
+def stable_hash(obj):
+    """Deterministic digest of a prep result (dict key order and process do not matter)."""
+    return hashlib.sha256(json.dumps(obj,sort_keys=True,default=repr,ensure_ascii=False).encode()).hexdigest()
+
+class NodeCache:
+    """Base for exec-result caches. Backends implement _get/_set/clear; hit/miss counters are kept per node name."""
+    def __init__(self,maxsize=1024,ttl=None): self.maxsize,self.ttl,self.stats,self._lock=maxsize,ttl,{},threading.Lock()
+    def lookup(self,name,key):
+        hit,val=self._get(f"{name}:{key}")
+        with self._lock: s=self.stats.setdefault(name,{"hits":0,"misses":0}); s["hits" if hit else "misses"]+=1
+        return hit,val
+    def store(self,name,key,val): self._set(f"{name}:{key}",val)
+    def hit_rate(self,name):
+        s=self.stats.get(name) or {"hits":0,"misses":0}; n=s["hits"]+s["misses"]
+        return s["hits"]/n if n else 0.0
+    def _expired(self,created): return self.ttl is not None and time.time()-created>self.ttl
+    def __getstate__(self): st=self.__dict__.copy(); del st["_lock"]; return st  # lets nodes holding a cache cross process boundaries
+    def __setstate__(self,st): self.__dict__.update(st); self._lock=threading.Lock()
+    def _get(self,key): raise NotImplementedError
+    def _set(self,key,val): raise NotImplementedError
+    def clear(self): raise NotImplementedError
+
+class MemoryCache(NodeCache):
+    """In-process LRU with optional TTL."""
+    def __init__(self,maxsize=1024,ttl=None): super().__init__(maxsize,ttl); self._data=OrderedDict()
+    def _get(self,key):
+        with self._lock:
+            if key not in self._data: return False,None
+            created,val=self._data[key]
+            if self._expired(created): del self._data[key]; return False,None
+            self._data.move_to_end(key); return True,val
+    def _set(self,key,val):
+        with self._lock:
+            self._data[key]=(time.time(),val); self._data.move_to_end(key)
+            while self.maxsize and len(self._data)>self.maxsize: self._data.popitem(last=False)
+    def clear(self):
+        with self._lock: self._data.clear()
+    def __len__(self): return len(self._data)
+
+class SQLiteCache(NodeCache):
+    """File-backed LRU with optional TTL; values are pickled so they survive restarts and are shared between processes."""
+    def __init__(self,path,maxsize=10000,ttl=None):
+        super().__init__(maxsize,ttl); self.path=path
+        with self._conn() as c: c.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, created REAL, used REAL)")
+    def _conn(self): return sqlite3.connect(self.path,timeout=30)
+    def _get(self,key):
+        with self._conn() as c:
+            row=c.execute("SELECT value,created FROM cache WHERE key=?",(key,)).fetchone()
+            if row is None: return False,None
+            if self._expired(row[1]): c.execute("DELETE FROM cache WHERE key=?",(key,)); return False,None
+            c.execute("UPDATE cache SET used=? WHERE key=?",(time.time(),key)); return True,pickle.loads(row[0])
+    def _set(self,key,val):
+        now=time.time()
+        with self._conn() as c:
+            c.execute("INSERT OR REPLACE INTO cache VALUES (?,?,?,?)",(key,pickle.dumps(val),now,now))
+            if self.maxsize: c.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY used DESC LIMIT -1 OFFSET ?)",(self.maxsize,))
+    def clear(self):
+        with self._conn() as c: c.execute("DELETE FROM cache")
+    def __len__(self):
+        with self._conn() as c: return c.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
 class Node(BaseNode):
-    def __init__(self,max_retries=1,wait=0): super().__init__(); self.max_retries,self.wait=max_retries,wait
+    cache=None  # opt-in NodeCache; successful exec results are memoized by cache_key(prep_res)
+    cache_namespace=None  # cache entries are kept under this name (default: the class name); subclasses sharing it share entries
+    circuit_breaker=None  # opt-in CircuitBreaker; while open, exec is skipped and exec_fallback gets a CircuitOpenError
+    resources=()  # ResourcePool names (see resource_pool) held around every exec attempt, e.g. ("llm:openai",)
+    def __init__(self,max_retries=1,wait=0,cache=None,backoff=1,max_wait=None,jitter=0,retry_on=(Exception,),deadline=None,timeout=None):
+        """Attempt k (0-based) waits wait*backoff**k seconds, capped at max_wait and reduced by up to `jitter` (0..1) at random.
+        Only exceptions in retry_on are retried; others, and retries that would overrun the node `deadline` (seconds per exec)
+        or the enclosing flow's deadline or timeout, go straight to exec_fallback.
+        `timeout` bounds each attempt: a late async attempt is cancelled and fails with TimeoutError; a late sync attempt keeps
+        running on an abandoned thread and fails with ExecTimeout, which goes straight to exec_fallback rather than starting a
+        second concurrent attempt. Give blocking I/O its own, shorter timeout so the watchdog is only a backstop."""
+        super().__init__(); self.max_retries,self.wait,self.backoff,self.max_wait,self.jitter,self.retry_on,self.deadline,self.timeout=max_retries,wait,backoff,max_wait,jitter,retry_on,deadline,timeout
+        if cache is not None: self.cache=cache
+    @property
+    def retry_attempt(self): return _retry_attempt.get() if self.frozen else self.__dict__.get("_retry_attempt",0)
+    @retry_attempt.setter
+    def retry_attempt(self,n):
+        if self.frozen: _retry_attempt.set(n)
+        else: self._retry_attempt=n
+    def _retry_delay(self,exc,started):
+        """Seconds to sleep before the next attempt, or None to stop retrying."""
+        if self.retry_attempt>=self.max_retries-1 or not isinstance(exc,self.retry_on) or isinstance(exc,ExecTimeout): return None
+        d=self.wait*self.backoff**self.retry_attempt
+        if self.max_wait is not None: d=min(d,self.max_wait)
+        d*=1-self.jitter*random.random()
+        ends=[e for e in (_deadline.get(),_timeout_at.get(),started+self.deadline if self.deadline is not None else None) if e is not None]
+        if ends and time.monotonic()+d>=min(ends): return None
+        return d
+    def cache_key(self,prep_res): return stable_hash(prep_res)
+    def _cache_lookup(self,prep_res):
+        if self.cache is None: return None,False,None
+        key=self.cache_key(prep_res); return (key,*self.cache.lookup(self.cache_namespace or type(self).__name__,key))
+    def _cache_store(self,key,res):
+        if key is not None: self.cache.store(self.cache_namespace or type(self).__name__,key,res)
+        return res
+    def _circuit_open(self):
+        cb=self.circuit_breaker
+        if cb is None or cb.allow(): return None
+        _trace_event("circuit_open",breaker=cb.name); return CircuitOpenError(f"circuit '{cb.name}' is open")
+    def _circuit_record(self,ok,t0):
+        if self.circuit_breaker is not None: self.circuit_breaker.record(ok,time.monotonic()-t0)
     def exec_fallback(self,prep_res,exc): raise exc
+    def _exec_attempt(self,prep_res):
+        if self.resources:
+            with _holding(self.resources) as held: return self._exec_timed(prep_res,held)
+        return self._exec_timed(prep_res)
+    def _exec_timed(self,prep_res,held=None):
+        _check_cancelled()  # the flow may have run out while waiting for resources; don't start a doomed exec
+        if self.timeout is None: return self.exec(prep_res)
+        end=_timeout_at.get(); left=None if end is None else end-time.monotonic()
+        on_exit=None if held is None else held.pop_all().close  # the helper thread keeps the resource slots until exec returns
+        if left is not None and left<self.timeout: return _call_with_timeout(self.exec,prep_res,left,FlowTimeout,on_exit)
+        return _call_with_timeout(self.exec,prep_res,self.timeout,ExecTimeout,on_exit)
     def _exec(self,prep_res):
+        key,hit,res=self._cache_lookup(prep_res)
+        if hit: _trace_event("cache_hit"); return res
+        started=time.monotonic()
         for self.retry_attempt in range(self.max_retries):
-            try: return self.exec(prep_res)
+            _check_cancelled()
+            if (oe:=self._circuit_open()) is not None: return self.exec_fallback(prep_res,oe)
+            t0=time.monotonic()
+            try: res=self._exec_attempt(prep_res)
+            except FlowCancelled: raise
             except Exception as e:
-                if self.retry_attempt==self.max_retries-1: return self.exec_fallback(prep_res,e)
-                if self.wait>0: time.sleep(self.wait)
+                self._circuit_record(False,t0); d=self._retry_delay(e,started)
+                if d is None: _trace_event("fallback",error=repr(e)); return self.exec_fallback(prep_res,e)
+                _trace_event("retry",attempt=self.retry_attempt,error=repr(e),delay=d)
+                if d>0: _sleep(d)
+            else: self._circuit_record(True,t0); return self._cache_store(key,res)
 
 class BatchNode(Node):
     def _exec(self,items): return [super(BatchNode,self)._exec(i) for i in (items or [])]
 
+class ThreadPoolBatchNode(BatchNode):
+    """BatchNode whose items go through exec concurrently on up to max_workers threads (default: one per item).
+    Each item keeps its own retries, cache, breaker and resources; results keep input order and the first failing item raises."""
+    retry_attempt=property(lambda self: _retry_attempt.get(),lambda self,n: _retry_attempt.set(n))  # per item, since items retry concurrently
+    def __init__(self,*args,max_workers=None,**kwargs): super().__init__(*args,**kwargs); self.max_workers=max_workers
+    def _exec(self,items):
+        items=list(items or [])
+        if len(items)<=1: return super()._exec(items)
+        with ThreadPoolExecutor(max_workers=self.max_workers or len(items)) as ex:
+            futures=[ex.submit(contextvars.copy_context().run,super(BatchNode,self)._exec,i) for i in items]
+            return [f.result() for f in futures]
+
+BatchResult=namedtuple("BatchResult","params shared error")  # one sub-flow run of a pooled BatchFlow
+
+def _check_picklable(obj,what):
+    try: pickle.dumps(obj)
+    except Exception as e: raise TypeError(f"{what} must be picklable to run in a process pool: {e}") from e
+
+def _pool_node_chunk(node,chunk): return [super(BatchNode,node)._exec(i) for i in chunk]
+
+def _run_chunks(ex,fn,target,items,chunksize):
+    futs=[ex.submit(fn,target,items[i:i+chunksize]) for i in range(0,len(items),chunksize)]
+    return [r for f in futs for r in f.result()]
+
+class ProcessPoolBatchNode(BatchNode):
+    """BatchNode whose per-item exec runs in worker processes, `chunksize` items per task.
+    Results come back in input order.
+    `initializer(*initargs)` runs once per worker, e.g. to warm module-level caches. Pass `pool` to reuse an executor across runs."""
+    def __init__(self,*args,max_workers=None,chunksize=1,initializer=None,initargs=(),pool=None,**kwargs):
+        super().__init__(*args,**kwargs)
+        self.max_workers,self.chunksize,self.initializer,self.initargs,self.pool=max_workers,chunksize,initializer,initargs,pool
+    def _worker_copy(self): w=copy.copy(self); w.successors,w.cache,w.pool={},None,None; return w
+    def _exec(self,items):
+        items=list(items or [])
+        if not items: return []
+        worker=self._worker_copy(); _check_picklable(worker,type(self).__name__); _check_picklable(items[0],"batch item")
+        if self.pool is not None: return _run_chunks(self.pool,_pool_node_chunk,worker,items,self.chunksize)
+        with ProcessPoolExecutor(self.max_workers,initializer=self.initializer,initargs=self.initargs) as ex:
+            return _run_chunks(ex,_pool_node_chunk,worker,items,self.chunksize)
+
 class Flow(BaseNode):
-    def __init__(self,start=None): super().__init__(); self.start_node=start
+    def __init__(self,start=None,tracer=None,deadline=None,checkpoint_store=None,timeout=None):
+        # deadline: retry budget in seconds per run. checkpoint_store: a NodeCache (MemoryCache with ttl, SQLiteCache, ...)
+        # that receives shared + progress after every node when run(shared,run_id=...) is used; the same run_id resumes there.
+        # timeout: seconds after which the run raises FlowTimeout (checked between nodes; async flows cancel in-flight work).
+        super().__init__(); self.start_node,self.tracer,self.deadline,self.checkpoint_store,self.timeout=start,tracer,deadline,checkpoint_store,timeout
+    @contextlib.contextmanager
+    def _run_context(self,run_id,cancel_token):
+        tok=_checkpoint_run.set((self,run_id)) if run_id is not None else None
+        ctok=_cancel_token.set(cancel_token) if cancel_token is not None else None
+        try: yield
+        finally:
+            if ctok is not None: _cancel_token.reset(ctok)
+            if tok is not None: _checkpoint_run.reset(tok)
+    def run(self,shared,run_id=None,cancel_token=None):
+        with self._run_context(run_id,cancel_token): return super().run(shared)
+    def iter_events(self,shared,run_id=None,cancel_token=None):
+        """Run the flow in a background thread, yielding FlowEvents as nodes start and finish and a final flow_done.
+        Exceptions from the run are re-raised here after the events that preceded them; abandoning the iterator cancels the run."""
+        events,done,token=queue.Queue(),object(),cancel_token or CancelToken()
+        ctx=contextvars.copy_context(); ctx.run(_event_sink.set,events.put)
+        def work():
+            try: events.put(FlowEvent("flow_done",type(self).__name__,{"action":ctx.run(self.run,shared,run_id,token)}))
+            except BaseException as e: events.put(e)
+            finally: events.put(done)
+        threading.Thread(target=work,daemon=True,name=f"{type(self).__name__}-events").start()
+        finished=False
+        try:
+            while (ev:=events.get()) is not done:
+                if isinstance(ev,BaseException): finished=True; raise ev
+                yield ev
+            finished=True
+        finally:
+            if not finished: token.cancel("event consumer went away")
+    def _checkpoint(self):
+        ck=_checkpoint_run.get()
+        return ck[1] if ck is not None and ck[0] is self and self.checkpoint_store is not None else None
+    def _load_checkpoint(self,run_id,shared):
+        hit,cp=self.checkpoint_store.lookup(type(self).__name__,str(run_id))
+        if not hit: return None
+        cp=copy.deepcopy(cp); shared.update(cp.pop("shared")); _trace_event("resume",run_id=str(run_id)); return cp
+    def _save_checkpoint(self,run_id,shared,**state): self.checkpoint_store.store(type(self).__name__,str(run_id),copy.deepcopy({**state,"shared":dict(shared)}))
+    def freeze(self):
+        """Compile the flow for reuse: the graph becomes read-only and runs stop copying nodes.
+        Per-run params and retry attempts move into the run context, so one frozen flow can serve concurrent runs."""
+        for n in [self,*self._graph()]:
+            if n.frozen: continue
+            if isinstance(n,Flow) and n is not self: n.freeze()
+            n.frozen=True
+        return self
+    def _node_for_run(self,node,params):
+        """The node instance to run with `params`: a configured copy, or the shared node itself once frozen."""
+        if node is None or self.frozen: return node
+        curr=copy.copy(node); curr.set_params(params); return curr
+    @contextlib.contextmanager
+    def _run_scope(self,params):
+        tok=_run_params.set(MappingProxyType(params)) if self.frozen else None
+        try: yield
+        finally:
+            if tok is not None: _run_params.reset(tok)
+    def _graph(self):
+        """Nodes reachable from start_node in a stable breadth-first order; checkpoints refer to nodes by this index."""
+        nodes,queue=[],[self.start_node]
+        while queue:
+            n=queue.pop(0)
+            if n is not None and not any(n is m for m in nodes): nodes.append(n); queue.extend(n.successors.values())
+        return nodes
+    def _resume_point(self,shared):
+        """(run_id, graph, start node, last action) for the current run, restoring shared from a checkpoint if one exists."""
+        rid=self._checkpoint()
+        if rid is None: return None,None,self.start_node,None
+        graph=self._graph(); cp=self._load_checkpoint(rid,shared)
+        if cp is None: return rid,graph,self.start_node,None
+        return rid,graph,(graph[cp["next"]] if cp["next"] is not None else None),cp["action"]
+    def _advance(self,rid,graph,shared,curr,last_action):
+        nxt=self.get_next_node(curr,last_action)
+        if rid is not None: self._save_checkpoint(rid,shared,next=next((i for i,m in enumerate(graph) if m is nxt),None),action=last_action)
+        if nxt is not None: _check_cancelled()
+        return nxt
+    @contextlib.contextmanager
+    def _flow_span(self):
+        tok=_tracer.set(self.tracer) if self.tracer is not None else None
+        dtok,ttok=_narrow(_deadline,self.deadline),_narrow(_timeout_at,self.timeout)
+        try:
+            with _span(type(self).__name__,kind="flow") as s: yield s
+        finally:
+            if ttok is not None: _timeout_at.reset(ttok)
+            if dtok is not None: _deadline.reset(dtok)
+            if tok is not None: _tracer.reset(tok)
     def start(self,start): self.start_node=start; return start
     def get_next_node(self,curr,action):
         nxt=curr.successors.get(action or "default")
         if not nxt and curr.successors: warnings.warn(f"Flow ends: '{action}' not found in {list(curr.successors)}")
         return nxt
     def _orch(self,shared,params=None):
-        curr,p,last_action =copy.copy(self.start_node),(params or {**self.params}),None
-        while curr: curr.set_params(p); last_action=curr._run(shared); curr=copy.copy(self.get_next_node(curr,last_action))
+        p=params or {**self.params}; rid,graph,curr,last_action=self._resume_point(shared)
+        with self._run_scope(p):
+            while curr: last_action=self._node_for_run(curr,p)._run(shared); curr=self._advance(rid,graph,shared,curr,last_action)
         return last_action
-    def _run(self,shared): p=self.prep(shared); o=self._orch(shared); return self.post(shared,p,o)
+    def _run(self,shared):
+        with self._flow_span() as s: p=self.prep(shared); o=self._orch(shared); s["attrs"]["action"]=a=self.post(shared,p,o); return a
     def post(self,shared,prep_res,exec_res): return exec_res
 
 class BatchFlow(Flow):
+    def _checkpoint(self): return None  # sub-flow runs share one run_id, so batch flows are not checkpointed
+    def _run(self,shared):
+        with self._flow_span():
+            pr=self.prep(shared) or []
+            for bp in pr: self._orch(shared,{**self.params,**bp})
+            return self.post(shared,pr,None)
+
+def _pool_flow_chunk(target,chunk):
+    flow,shared,out=*target,[]
+    for bp in chunk:
+        sub=copy.deepcopy(shared); flow._orch(sub,{**flow.params,**bp}); out.append(BatchResult(bp,sub,None))
+    return out
+
+class ProcessPoolBatchFlow(BatchFlow):
+    """BatchFlow whose sub-flows run in worker processes on a private copy of shared.
+    post() receives the list of BatchResult(params, shared, error) to merge back; error is always None here (failures raise)."""
+    def __init__(self,*args,max_workers=None,chunksize=1,initializer=None,initargs=(),pool=None,**kwargs):
+        super().__init__(*args,**kwargs)
+        self.max_workers,self.chunksize,self.initializer,self.initargs,self.pool=max_workers,chunksize,initializer,initargs,pool
+    def _run(self,shared):
+        with self._flow_span():
+            pr=list(self.prep(shared) or [])
+            worker=copy.copy(self); worker.successors,worker.tracer,worker.pool={},None,None
+            _check_picklable(worker,type(self).__name__); _check_picklable(shared,"shared store")
+            if self.pool is not None: results=_run_chunks(self.pool,_pool_flow_chunk,(worker,shared),pr,self.chunksize)
+            else:
+                with ProcessPoolExecutor(self.max_workers,initializer=self.initializer,initargs=self.initargs) as ex: results=_run_chunks(ex,_pool_flow_chunk,(worker,shared),pr,self.chunksize)
+            return self.post(shared,pr,results)
+    def post(self,shared,prep_res,exec_res): return None
+
+class ThreadPoolBatchFlow(BatchFlow):
+    """BatchFlow whose sub-flows run concurrently on up to max_workers threads, each on its own deep copy of shared.
+    A failing item does not abort the batch: post() receives BatchResult(params, shared, error) per item, in prep order."""
+    def __init__(self,*args,max_workers=None,**kwargs): super().__init__(*args,**kwargs); self.max_workers=max_workers
+    def _run_item(self,shared,bp):
+        _check_cancelled(); sub=copy.deepcopy(shared)
+        try: self._orch(sub,{**self.params,**bp})
+        except FlowCancelled: raise
+        except Exception as e: _trace_event("item_error",params=repr(bp),error=repr(e)); return BatchResult(bp,sub,e)
+        return BatchResult(bp,sub,None)
     def _run(self,shared):
-        pr=self.prep(shared) or []
-        for bp in pr: self._orch(shared,{**self.params,**bp})
-        return self.post(shared,pr,None)
+        with self._flow_span():
+            pr=list(self.prep(shared) or [])
+            with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+                results=[f.result() for f in [ex.submit(contextvars.copy_context().run,self._run_item,shared,bp) for bp in pr]]
+            return self.post(shared,pr,results)
+    def post(self,shared,prep_res,exec_res): return None
+
+class DagFlow(Flow):
+    """Runs nodes by data dependency instead of successor chain.
+    A node waits for every earlier node that writes a key it reads (or writes); independent branches run concurrently."""
+    def __init__(self,nodes=(),max_workers=None,**kwargs): super().__init__(**kwargs); self.nodes,self.max_workers=list(nodes),max_workers
+    def add(self,node):
+        if self.frozen: raise RuntimeError(f"{type(self).__name__} is frozen; add nodes before Flow.freeze()")
+        self.nodes.append(node); return node
+    def _graph(self): return list(self.nodes)
+    def freeze(self): super().freeze(); self.nodes=tuple(self.nodes); return self
+    def dependencies(self):
+        deps=[]
+        for i,n in enumerate(self.nodes):
+            need=set(n.reads)|set(n.writes)
+            deps.append({j for j,m in enumerate(self.nodes[:i]) if need&set(m.writes) or set(n.writes)&set(m.reads)})
+        return deps
+    def _orch(self,shared,params=None):
+        p,deps,running,rid=(params or {**self.params}),self.dependencies(),{},self._checkpoint()
+        actions=((self._load_checkpoint(rid,shared) or {}).get("actions",{}) if rid is not None else {}); done=set(actions)
+        with self._run_scope(p),ThreadPoolExecutor(max_workers=self.max_workers or len(self.nodes) or 1) as ex:
+            while len(done)<len(self.nodes):
+                for i,n in enumerate(self.nodes):
+                    if i not in done and i not in running.values() and deps[i]<=done:
+                        running[ex.submit(contextvars.copy_context().run,self._node_for_run(n,p)._run,shared)]=i
+                finished,_=_wait(running,return_when=FIRST_COMPLETED)
+                for f in finished:
+                    i=running.pop(f); actions[i]=f.result(); done.add(i)
+                    if rid is not None: self._save_checkpoint(rid,shared,actions=actions)
+                if len(done)<len(self.nodes): _check_cancelled()
+        return actions.get(len(self.nodes)-1)
 
 class AsyncNode(Node):
     async def prep_async(self,shared): pass
@@ -69,17 +792,84 @@ class AsyncNode(Node):
     async def exec_fallback_async(self,prep_res,exc): raise exc
     async def post_async(self,shared,prep_res,exec_res): pass
     async def _exec(self,prep_res): 
+        key,hit,res=self._cache_lookup(prep_res)
+        if hit: _trace_event("cache_hit"); return res
+        started=time.monotonic()
         for self.retry_attempt in range(self.max_retries):
-            try: return await self.exec_async(prep_res)
+            if (oe:=self._circuit_open()) is not None: return await self.exec_fallback_async(prep_res,oe)
+            t0=time.monotonic()
+            try: res=await self._exec_attempt_async(prep_res)
+            except FlowCancelled: raise
             except Exception as e:
-                if self.retry_attempt==self.max_retries-1: return await self.exec_fallback_async(prep_res,e)
-                if self.wait>0: await asyncio.sleep(self.wait)
+                self._circuit_record(False,t0); d=self._retry_delay(e,started)
+                if d is None: _trace_event("fallback",error=repr(e)); return await self.exec_fallback_async(prep_res,e)
+                _trace_event("retry",attempt=self.retry_attempt,error=repr(e),delay=d)
+                if d>0: await asyncio.sleep(d)
+            else: self._circuit_record(True,t0); return self._cache_store(key,res)
+    async def _exec_attempt_async(self,prep_res):
+        if self.resources:
+            async with _holding_async(self.resources): return await self._exec_timed_async(prep_res)
+        return await self._exec_timed_async(prep_res)
+    async def _exec_timed_async(self,prep_res):
+        return await (self.exec_async(prep_res) if self.timeout is None else asyncio.wait_for(self.exec_async(prep_res),self.timeout))
     async def run_async(self,shared): 
         if self.successors: warnings.warn("Node won't run successors. Use AsyncFlow.")  
         return await self._run_async(shared)
-    async def _run_async(self,shared): p=await self.prep_async(shared); e=await self._exec(p); return await self.post_async(shared,p,e)
+    async def _run_async(self,shared):
+        with _node_events(self,shared),_span(type(self).__name__,kind="node") as s:
+            with _span("prep"): p=await self.prep_async(shared)
+            with _span("exec"): e=await self._exec(p)
+            with _span("post"): s["attrs"]["action"]=a=await self.post_async(shared,p,e)
+            return a
     def _run(self,shared): raise RuntimeError("Use run_async.")
 
+class HedgedAsyncNode(AsyncNode):
+    """Hedged requests: if attempt 0 has not answered after the hedge delay, launch an identical attempt
+    (up to max_hedges extra, one delay apart). The first success wins and the losers are cancelled.
+    Implement exec_hedge_async(prep_res,hedge_index); hedge_provider(i) cycles through hedge_providers for cross-provider hedging.
+    With hedge_delay=None the delay tracks the hedge_quantile of recent winning latencies (initial_hedge_delay until warm)."""
+    def __init__(self,*args,hedge_delay=None,hedge_quantile=0.9,initial_hedge_delay=2.0,max_hedges=1,hedge_providers=None,window=200,**kwargs):
+        super().__init__(*args,**kwargs)
+        self.hedge_delay,self.hedge_quantile,self.initial_hedge_delay,self.max_hedges,self.hedge_providers=hedge_delay,hedge_quantile,initial_hedge_delay,max_hedges,hedge_providers
+        self.hedge_stats,self._latencies={"requests":0,"hedges":0,"hedge_wins":0,"cancelled":0},deque(maxlen=window)
+        self._stats_lock=threading.Lock()  # frozen flows share the node across request threads
+    async def exec_hedge_async(self,prep_res,hedge_index): pass
+    def hedge_provider(self,hedge_index): return self.hedge_providers[hedge_index%len(self.hedge_providers)] if self.hedge_providers else None
+    def current_hedge_delay(self):
+        if self.hedge_delay is not None: return self.hedge_delay
+        with self._stats_lock: xs=sorted(self._latencies)
+        if len(xs)<20: return self.initial_hedge_delay
+        return xs[min(len(xs)-1,int(self.hedge_quantile*len(xs)))]
+    def _count(self,key):
+        with self._stats_lock: self.hedge_stats[key]+=1
+    def hedge_report(self):
+        with self._stats_lock: st,xs=dict(self.hedge_stats),sorted(self._latencies)
+        st["hedge_delay"]=self.current_hedge_delay()
+        if xs: st["p50"],st["p90"]=xs[len(xs)//2],xs[min(len(xs)-1,int(0.9*len(xs)))]
+        return st
+    async def exec_async(self,prep_res):
+        delay,tasks,started,err=self.current_hedge_delay(),[],[],None
+        def launch():
+            tasks.append(asyncio.ensure_future(self.exec_hedge_async(prep_res,len(tasks)))); started.append(time.monotonic())
+            if len(tasks)>1: self._count("hedges"); _trace_event("hedge",hedge_index=len(tasks)-1)
+        self._count("requests"); launch(); pending=set(tasks)
+        try:
+            while pending:
+                can_hedge=len(tasks)<=self.max_hedges
+                done,pending=await asyncio.wait(pending,timeout=delay if can_hedge else None,return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        i=tasks.index(t)
+                        with self._stats_lock: self._latencies.append(time.monotonic()-started[i])
+                        if i>0: self._count("hedge_wins")
+                        return t.result()
+                    err=t.exception()
+                if not done and can_hedge: launch(); pending.add(tasks[-1])
+            raise err
+        finally:
+            for t in tasks:
+                if not t.done(): t.cancel(); self._count("cancelled")
+
 class AsyncBatchNode(AsyncNode,BatchNode):
     async def _exec(self,items): 
         results = []
@@ -89,34 +879,100 @@ class AsyncBatchNode(AsyncNode,BatchNode):
         return results
 
 class AsyncParallelBatchNode(AsyncNode,BatchNode):
+    def __init__(self,*args,max_concurrency=None,rate_per_sec=None,**kwargs): super().__init__(*args,**kwargs); self.max_concurrency,self.rate_per_sec=max_concurrency,rate_per_sec
+    def _item_stream(self,items,ordered=False): return _bounded_map(super(AsyncParallelBatchNode,self)._exec,items or [],self.max_concurrency,self.rate_per_sec,ordered)
     async def _exec(self,items): 
         if not items:
             return []
-        return await asyncio.gather(*(super(AsyncParallelBatchNode,self)._exec(i) for i in items))
+        results=[None]*len(items)
+        async for i,r in self._item_stream(items): results[i]=r
+        return results
+    async def stream_async(self,shared,ordered=True):
+        """Run the node, yielding (index,result) per item as results arrive; post_async still gets the full ordered list."""
+        p=await self.prep_async(shared) or []; results=[None]*len(p)
+        async for i,r in self._item_stream(p,ordered): results[i]=r; yield i,r
+        await self.post_async(shared,p,results)
 
 class AsyncFlow(Flow,AsyncNode):
+    def __init__(self,start=None,sync_executor=None,process_executor=None,**kwargs):
+        # sync_executor runs sync nodes (None: the loop's default thread pool); not to be confused with a node's own `executor`
+        super().__init__(start,**kwargs); self.sync_executor,self.process_executor=sync_executor,process_executor
+    async def _run_node(self,curr,shared):
+        if isinstance(curr,AsyncNode): return await curr._run_async(shared)
+        ex,loop=curr.executor,asyncio.get_running_loop()
+        if ex=="inline": return curr._run(shared)
+        if ex=="process" or isinstance(ex,ProcessPoolExecutor):
+            # only exec crosses the process boundary; prep/post touch shared here. Node caches are not consulted.
+            pool=ex if isinstance(ex,Executor) else (self.process_executor or default_process_pool())
+            detached=copy.copy(curr); detached.successors,detached.cache={},None
+            with _node_events(curr,shared),_span(type(curr).__name__,kind="node",executor="process") as s:
+                with _span("prep"): p=curr.prep(shared)
+                with _span("exec"): e=await loop.run_in_executor(pool,detached._exec,p)
+                with _span("post"): s["attrs"]["action"]=a=curr.post(shared,p,e)
+                return a
+        return await loop.run_in_executor(ex if isinstance(ex,Executor) else self.sync_executor,contextvars.copy_context().run,curr._run,shared)
+    async def run_async(self,shared,run_id=None,cancel_token=None):
+        with self._run_context(run_id,cancel_token): return await super().run_async(shared)
+    async def aiter_events(self,shared,run_id=None,cancel_token=None):
+        """Async counterpart of iter_events; the run is a task on the current loop and is cancelled if iteration stops early."""
+        events,loop=asyncio.Queue(),asyncio.get_running_loop()
+        tok=_event_sink.set(lambda ev: loop.call_soon_threadsafe(events.put_nowait,ev))  # nodes may run in executor threads
+        try: task=asyncio.ensure_future(self.run_async(shared,run_id,cancel_token))
+        finally: _event_sink.reset(tok)
+        task.add_done_callback(lambda t: loop.call_soon(events.put_nowait,None))  # after any events the sink already queued
+        try:
+            while (ev:=await events.get()) is not None: yield ev
+            yield FlowEvent("flow_done",type(self).__name__,{"action":task.result()})
+        finally:
+            if not task.done(): task.cancel(); await asyncio.gather(task,return_exceptions=True)  # let it unwind before the loop may close
     async def _orch_async(self,shared,params=None):
-        curr,p,last_action =copy.copy(self.start_node),(params or {**self.params}),None
-        while curr: curr.set_params(p); last_action=await curr._run_async(shared) if isinstance(curr,AsyncNode) else curr._run(shared); curr=copy.copy(self.get_next_node(curr,last_action))
+        p=params or {**self.params}; rid,graph,curr,last_action=self._resume_point(shared)
+        with self._run_scope(p):
+            while curr: last_action=await self._run_node(self._node_for_run(curr,p),shared); curr=self._advance(rid,graph,shared,curr,last_action)
         return last_action
-    async def _run_async(self,shared): p=await self.prep_async(shared); o=await self._orch_async(shared); return await self.post_async(shared,p,o)
+    async def _run_async(self,shared):
+        with self._flow_span() as s,_cancel_scope(): p=await self.prep_async(shared); o=await self._orch_async(shared); s["attrs"]["action"]=a=await self.post_async(shared,p,o); return a
     async def post_async(self,shared,prep_res,exec_res): return exec_res
 
+class AsyncDagFlow(DagFlow,AsyncFlow):
+    def __init__(self,nodes=(),max_workers=None,sync_executor=None,process_executor=None,**kwargs):
+        super().__init__(nodes,max_workers,**kwargs); self.sync_executor,self.process_executor=sync_executor,process_executor
+    async def _orch_async(self,shared,params=None):
+        p,deps,tasks,rid=(params or {**self.params}),self.dependencies(),[],self._checkpoint()
+        actions=((self._load_checkpoint(rid,shared) or {}).get("actions",{}) if rid is not None else {})
+        async def run(i):
+            if i in actions: return actions[i]
+            await asyncio.gather(*(tasks[j] for j in deps[i]))
+            a=await self._run_node(self._node_for_run(self.nodes[i],p),shared)
+            if rid is not None: actions[i]=a; self._save_checkpoint(rid,shared,actions=actions)
+            return a
+        with self._run_scope(p):
+            for i in range(len(self.nodes)): tasks.append(asyncio.ensure_future(run(i)))
+        try: actions=await asyncio.gather(*tasks)
+        except BaseException:
+            for t in tasks: t.cancel()  # like DagFlow, stop the remaining nodes once one fails
+            await asyncio.gather(*tasks,return_exceptions=True); raise
+        return actions[-1] if actions else None
+
 class AsyncBatchFlow(AsyncFlow,BatchFlow):
     async def _run_async(self,shared):
-        pr=await self.prep_async(shared) or []
-        for bp in pr: await self._orch_async(shared,{**self.params,**bp})
-        return await self.post_async(shared,pr,None)
+        with self._flow_span(),_cancel_scope():
+            pr=await self.prep_async(shared) or []
+            for bp in pr: await self._orch_async(shared,{**self.params,**bp})
+            return await self.post_async(shared,pr,None)
 
 class AsyncParallelBatchFlow(AsyncFlow,BatchFlow):
+    def __init__(self,*args,max_concurrency=None,rate_per_sec=None,**kwargs): super().__init__(*args,**kwargs); self.max_concurrency,self.rate_per_sec=max_concurrency,rate_per_sec
     async def _run_async(self,shared): 
-        pr=await self.prep_async(shared) or []
-        await asyncio.gather(*(self._orch_async(shared,{**self.params,**bp}) for bp in pr))
-        return await self.post_async(shared,pr,None)
+        with self._flow_span(),_cancel_scope():
+            pr=await self.prep_async(shared) or []
+            async for _ in _bounded_map(lambda bp: self._orch_async(shared,{**self.params,**bp}),pr,self.max_concurrency,self.rate_per_sec): pass
+            return await self.post_async(shared,pr,None)
     
 __version__ = "0.2.1"
 __all__ = [
-    'BaseNode', 'Node', 'BatchNode', 'Flow', 'BatchFlow',
-    'AsyncNode', 'AsyncBatchNode', 'AsyncParallelBatchNode', 
-    'AsyncFlow', 'AsyncBatchFlow', 'AsyncParallelBatchFlow'
+    'RateLimiter', 'Tracer', 'CircuitBreaker', 'CircuitOpenError', 'PoolSaturated', 'ExecTimeout', 'CancelToken', 'FlowCancelled', 'FlowTimeout', 'current_cancel_token', 'circuit_breaker', 'circuit_breaker_states', 'ResourcePool', 'resource_pool', 'resource_pool_stats', 'SingleFlight', 'single_flight', 'single_flight_stats', 'default_process_pool', 'stable_hash', 'NodeCache', 'MemoryCache', 'SQLiteCache',
+    'FlowEvent', 'BaseNode', 'Node', 'BatchNode', 'ThreadPoolBatchNode', 'ProcessPoolBatchNode', 'Flow', 'BatchFlow', 'ThreadPoolBatchFlow', 'ProcessPoolBatchFlow', 'DagFlow', 'BatchResult',
+    'AsyncNode', 'HedgedAsyncNode', 'AsyncBatchNode', 'AsyncParallelBatchNode', 
+    'AsyncFlow', 'AsyncDagFlow', 'AsyncBatchFlow', 'AsyncParallelBatchFlow'
 ]
\ No newline at end of file
@@ -3,17 +3,111 @@
 实现八字分析、风水建议等核心业务逻辑
 """
 
-from macore import Node
-from utils.call_llm import call_llm
+from macore import Node, ThreadPoolBatchNode, ProcessPoolBatchNode, HedgedAsyncNode, circuit_breaker, resource_pool
+from utils.call_llm import call_llm, call_llm_async
 from utils.bazi_calculator import calculate_bazi
 from utils.wuxing_analyzer import analyze_wuxing
 from utils.fengshui_advisor import generate_fengshui_advice
 from utils.calendar_query import get_daily_fortune, find_auspicious_days
+from utils.simple_analyzer import generate_simple_analysis
+from utils.cache_store import open_cache
+from utils.analysis_cache import ANALYSIS_CACHE, NAME_PLACEHOLDER, signature_key, personalize
+from utils.analysis_fragments import STEM_ELEMENTS, BRANCH_SEASONS, compose_analysis, load_fragments, precompute_items
+from concurrent.futures import ThreadPoolExecutor
+import threading
 import json
+import os
+
+class LLMResponseError(ValueError):
+    """LLM输出无法解析为预期结构"""
+
+# LLM调用的可重试异常：网络、超时、限流、服务端错误和无法解析的输出；缺少API Key等配置错误不重试
+LLM_RETRYABLE_ERRORS = (TimeoutError, ConnectionError, LLMResponseError)
+try:
+    import openai
+    LLM_RETRYABLE_ERRORS += (
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.RateLimitError,
+        openai.InternalServerError
+    )
+except ImportError:
+    pass
+
+# LLM节点的重试策略：指数退避（1s、2s、4s…封顶8s）加随机抖动，单次执行总预算30秒
+# 单次调用超过LLM_CALL_TIMEOUT秒由HTTP客户端中止请求，按可重试错误处理；
+# 节点超时比它多留5秒，仅作兜底：兜底超时时请求线程仍在运行，节点不再重试而直接降级，避免重复计费的并发调用
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "25"))
+LLM_RETRY_POLICY = {
+    "max_retries": 3,
+    "wait": 1,
+    "backoff": 2,
+    "max_wait": 8,
+    "jitter": 0.5,
+    "retry_on": LLM_RETRYABLE_ERRORS,
+    "deadline": 30,
+    "timeout": LLM_CALL_TIMEOUT + 5
+}
+
+# LLM熔断器：窗口内连续失败或慢调用达到阈值后打开，期间LLM节点直接走传统算法降级，超时后半开探测恢复
+LLM_CIRCUIT_BREAKER = circuit_breaker(
+    "llm",
+    failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+    window=60,
+    slow_call_seconds=float(os.getenv("LLM_SLOW_CALL_SECONDS", "20")),
+    reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+)
+
+# LLM服务商配额：同一服务商的所有调用在进程内共享并发数与每分钟请求数上限，等待者先到先得
+def llm_resource(provider=None):
+    """LLM服务商对应的资源池名称，未指定服务商时使用LLM_PROVIDER"""
+    return f"llm:{(provider or os.getenv('LLM_PROVIDER', 'openai')).lower()}"
+
+for _provider in ("openai", "deepseek", "gemini"):
+    resource_pool(
+        llm_resource(_provider),
+        max_concurrent=int(os.getenv("LLM_MAX_CONCURRENT", "20")),
+        rate_per_minute=float(os.getenv("LLM_RATE_PER_MINUTE", "500"))
+    )
+
+# 对冲请求配置：超过延迟仍未返回时再发一次相同请求（LLM_HEDGE_DELAY未设置时按近期p90自适应）
+# LLM_HEDGE_PROVIDERS可设置为"openai,deepseek"，对冲请求将轮流发往不同服务商
+LLM_HEDGE_POLICY = {
+    "hedge_delay": float(os.environ["LLM_HEDGE_DELAY"]) if os.getenv("LLM_HEDGE_DELAY") else None,
+    "initial_hedge_delay": 8.0,
+    "max_hedges": 1,
+    "hedge_providers": [p.strip() for p in os.getenv("LLM_HEDGE_PROVIDERS", "").split(",") if p.strip()] or None
+}
+
+def _parse_yaml_block(llm_response):
+    """提取LLM输出中 ```yaml 代码块并解析，没有代码块时返回None"""
+    yaml_start = llm_response.find("```yaml")
+    yaml_end = llm_response.find("```", yaml_start + 7)
+    if yaml_start == -1 or yaml_end == -1:
+        return None
+    import yaml
+    return yaml.safe_load(llm_response[yaml_start + 7:yaml_end].strip())
+
+def _parse_llm_analysis(llm_response):
+    """解析LLM输出的YAML分析，无法解析时抛出LLMResponseError（交由重试与降级处理，避免默认内容被缓存）"""
+    try:
+        llm_analysis = _parse_yaml_block(llm_response)
+    except Exception as e:
+        raise LLMResponseError(f"LLM分析解析失败: {e}") from e
+    if not isinstance(llm_analysis, dict):
+        raise LLMResponseError("LLM输出中没有YAML分析")
+    return llm_analysis
+
+def _node_cache(maxsize, ttl):
+    """节点结果缓存：设置NODE_CACHE_PATH时使用SQLite文件（多进程共享、重启保留），否则使用进程内LRU"""
+    return open_cache(os.getenv("NODE_CACHE_PATH"), maxsize=maxsize, ttl=ttl)
 
 class UserInfoCollectionNode(Node):
     """用户信息收集节点"""
     
+    reads = ("user_info",)
+    writes = ("user_info",)
+    
     def prep(self, shared):
         """从共享存储中获取用户信息"""
         return shared.get("user_info", {})
@@ -45,6 +139,9 @@ class UserInfoCollectionNode(Node):
 class BaziCalculationNode(Node):
     """八字计算节点"""
     
+    reads = ("user_info",)
+    writes = ("bazi_result",)
+    
     def prep(self, shared):
         """从共享存储读取用户信息"""
         user_info = shared.get("user_info")
@@ -80,6 +177,18 @@ class BaziCalculationNode(Node):
 class FortuneAnalysisNode(Node):
     """命理分析节点"""
     
+    reads = ("user_info", "bazi_result")
+    writes = ("analysis_result",)
+    # 分析结果只取决于四柱和性别：按八字签名缓存，八字相同的用户共用一次LLM分析；
+    # 固定命名空间，对冲版本等子类与本节点共用缓存条目
+    cache = ANALYSIS_CACHE
+    cache_namespace = "FortuneAnalysisNode"
+    circuit_breaker = LLM_CIRCUIT_BREAKER
+    resources = (llm_resource(),)
+    
+    def __init__(self, **kwargs):
+        super().__init__(**{**LLM_RETRY_POLICY, **kwargs})
+    
     def prep(self, shared):
         """从共享存储读取八字和用户信息"""
         bazi_result = shared.get("bazi_result")
@@ -93,22 +202,32 @@ class FortuneAnalysisNode(Node):
             "user_info": user_info
         }
     
+    def cache_key(self, prep_data):
+        """以规范化的八字签名（四柱+性别）为缓存键，与姓名、出生地无关"""
+        return signature_key(prep_data["bazi_result"], prep_data["user_info"]["gender"])
+    
     def exec(self, prep_data):
-        """调用LLM进行命理分析"""
+        """调用LLM进行命理分析（结果中的姓名为占位符，写入共享存储时替换）"""
         print("\n=== 正在进行命理分析 ===")
         
-        bazi_result = prep_data["bazi_result"]
-        user_info = prep_data["user_info"]
-        
         # 先进行五行分析
-        wuxing_analysis = analyze_wuxing(bazi_result)
+        wuxing_analysis = analyze_wuxing(prep_data["bazi_result"])
         
         # 使用LLM进行更深入的性格和运势分析
-        analysis_prompt = f"""
+        llm_response = call_llm(self._build_prompt(prep_data, wuxing_analysis), timeout=LLM_CALL_TIMEOUT)
+        
+        return self._combine_analysis(prep_data, wuxing_analysis, _parse_llm_analysis(llm_response))
+    
+    def _build_prompt(self, prep_data, wuxing_analysis):
+        """构造命理分析提示词"""
+        bazi_result = prep_data["bazi_result"]
+        user_info = prep_data["user_info"]
+        
+        return f"""
 请根据以下八字信息进行命理分析，以YAML格式输出：
 
 用户信息：
-- 姓名：{user_info['name']}
+- 姓名：{NAME_PLACEHOLDER}（称呼用户时请原样保留此占位符）
 - 性别：{user_info['gender']}
 - 生肖：{bazi_result['zodiac']}
 
@@ -147,25 +266,9 @@ life_advice:
   - "人生建议2"
   - "人生建议3"
 ```"""
-
-        llm_response = call_llm(analysis_prompt)
-        
-        try:
-            # 提取YAML内容
-            yaml_start = llm_response.find("```yaml")
-            yaml_end = llm_response.find("```", yaml_start + 7)
-            
-            if yaml_start != -1 and yaml_end != -1:
-                yaml_content = llm_response[yaml_start + 7:yaml_end].strip()
-                import yaml
-                llm_analysis = yaml.safe_load(yaml_content)
-            else:
-                # 如果没有找到YAML格式，使用默认分析
-                llm_analysis = self._get_default_analysis(bazi_result)
-        except Exception as e:
-            print(f"LLM分析解析失败，使用默认分析: {e}")
-            llm_analysis = self._get_default_analysis(bazi_result)
-        
+    
+    def _combine_analysis(self, prep_data, wuxing_analysis, llm_analysis):
+        """将解析后的LLM分析与五行分析合并"""
         # 合并五行分析和LLM分析
         combined_analysis = {
             "wuxing_analysis": wuxing_analysis,
@@ -186,6 +289,27 @@ life_advice:
         
         return combined_analysis
     
+    def exec_fallback(self, prep_data, exc):
+        """LLM不可用（熔断打开或重试耗尽）时，使用传统算法生成分析"""
+        print(f"LLM分析不可用，使用传统算法分析: {exc}")
+        
+        bazi_result = prep_data["bazi_result"]
+        wuxing_analysis = analyze_wuxing(bazi_result)
+        simple_analysis = generate_simple_analysis(
+            bazi_result["wuxing"],
+            bazi_result["zodiac"],
+            wuxing_analysis["balance_score"]
+        )
+        
+        # 降级结果不写入缓存；传统算法输出异常时使用默认分析
+        try:
+            llm_analysis = _parse_llm_analysis(simple_analysis)
+        except LLMResponseError as e:
+            print(f"传统算法分析解析失败，使用默认分析: {e}")
+            llm_analysis = self._get_default_analysis(bazi_result)
+        
+        return self._combine_analysis(prep_data, wuxing_analysis, llm_analysis)
+    
     def _get_default_analysis(self, bazi_result):
         """默认分析内容"""
         return {
@@ -213,16 +337,80 @@ life_advice:
         }
     
     def post(self, shared, prep_res, exec_res):
-        """将分析结果写入共享存储"""
-        shared["analysis_result"] = exec_res
+        """将姓名占位符替换为用户姓名后写入共享存储"""
+        shared["analysis_result"] = personalize(exec_res, prep_res["user_info"]["name"])
         print("✓ 命理分析完成")
         return "default"
 
-class FengshuiAdviceNode(Node):
-    """风水建议节点"""
+# 片段模式下的后台LLM补充分析：结果写入八字签名缓存，之后同八字的请求直接命中完整LLM分析
+_enrichment_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="analysis-enrich")
+_enrichment_pending, _enrichment_lock = set(), threading.Lock()
+
+class FragmentAnalysisNode(FortuneAnalysisNode):
+    """命理分析节点（预计算片段版本）：已有LLM分析时直接使用，否则由预计算片段合成，不等待LLM"""
+    
+    # 片段合成不调用LLM，不受LLM熔断与配额限制；缓存查找在exec中进行，避免把合成结果写入LLM分析缓存
+    cache = None
+    circuit_breaker = None
+    resources = ()
+    
+    def __init__(self, enrich=None, **kwargs):
+        # 合成只是本地查表，不需要LLM的重试与超时策略
+        super().__init__(**{"max_retries": 1, "deadline": None, "timeout": None, **kwargs})
+        if enrich is None:
+            enrich = os.getenv("ANALYSIS_FRAGMENT_ENRICH", "false").lower() in ("1", "true", "yes")
+        self.enrich = enrich
+    
+    def exec(self, prep_data):
+        """优先使用八字签名缓存中的LLM分析，其次合成预计算片段，片段缺失时才实时调用LLM"""
+        key = self.cache_key(prep_data)
+        hit, analysis = ANALYSIS_CACHE.lookup(FortuneAnalysisNode.cache_namespace, key)
+        if hit:
+            return analysis
+        
+        wuxing_analysis = analyze_wuxing(prep_data["bazi_result"])
+        analysis = compose_analysis(prep_data["bazi_result"], wuxing_analysis)
+        if analysis is None:
+            print("未找到预计算片段，实时调用LLM分析")
+            return FortuneAnalysisNode()._exec(prep_data)
+        
+        if self.enrich:
+            self._schedule_enrichment(key, prep_data)
+        return analysis
+    
+    def _schedule_enrichment(self, key, prep_data):
+        """后台运行一次完整的LLM分析（同一八字同时只有一个），成功后写入签名缓存"""
+        with _enrichment_lock:
+            if key in _enrichment_pending:
+                return
+            _enrichment_pending.add(key)
+        
+        def enrich():
+            try:
+                FortuneAnalysisNode()._exec(prep_data)
+            finally:
+                with _enrichment_lock:
+                    _enrichment_pending.discard(key)
+        
+        _enrichment_pool.submit(enrich)
+
+def create_fortune_analysis_node():
+    """按ANALYSIS_MODE选择命理分析节点：llm（默认，实时LLM分析）或 fragments（预计算片段合成）"""
+    if os.getenv("ANALYSIS_MODE", "llm").lower() == "fragments":
+        return FragmentAnalysisNode()
+    return FortuneAnalysisNode()
+
+# 支持的风水建议类型，共享存储中的advice_types可只请求其中一部分
+FENGSHUI_ADVICE_TYPES = ["general", "home", "career", "relationship"]
+
+class FengshuiAdviceNode(ThreadPoolBatchNode):
+    """风水建议节点（各类建议相互独立，并行生成）"""
+    
+    reads = ("user_info", "bazi_result", "analysis_result", "advice_types")
+    writes = ("fengshui_advice",)
     
     def prep(self, shared):
-        """从共享存储读取八字和分析结果"""
+        """从共享存储读取八字和分析结果，每个请求的建议类型生成一项"""
         bazi_result = shared.get("bazi_result")
         analysis_result = shared.get("analysis_result")
         user_info = shared.get("user_info")
@@ -230,43 +418,43 @@ class FengshuiAdviceNode(Node):
         if not all([bazi_result, analysis_result, user_info]):
             raise ValueError("缺少必要信息进行风水分析")
         
-        return {
-            "user_profile": {
-                "bazi_result": bazi_result,
-                "analysis_result": analysis_result,
-                "user_info": user_info
-            }
+        advice_types = shared.get("advice_types") or FENGSHUI_ADVICE_TYPES
+        unknown = [t for t in advice_types if t not in FENGSHUI_ADVICE_TYPES]
+        if unknown:
+            raise ValueError(f"不支持的风水建议类型: {', '.join(unknown)}")
+        
+        print("\n=== 正在生成风水建议 ===")
+        user_profile = {
+            "bazi_result": bazi_result,
+            "analysis_result": analysis_result,
+            "user_info": user_info
         }
+        return [{"user_profile": user_profile, "advice_type": t} for t in advice_types]
     
-    def exec(self, prep_data):
-        """调用LLM生成风水建议"""
-        print("\n=== 正在生成风水建议 ===")
-        
-        user_profile = prep_data["user_profile"]
-        
-        # 生成不同类型的风水建议
-        advice_types = ["general", "home", "career", "relationship"]
-        all_advice = {}
-        
-        for advice_type in advice_types:
-            advice = generate_fengshui_advice(user_profile, advice_type)
-            all_advice[advice_type] = advice
-            
-            print(f"✓ {advice_type} 风水建议生成完成")
-        
-        return all_advice
+    def exec(self, item):
+        """生成一种类型的风水建议"""
+        advice = generate_fengshui_advice(item["user_profile"], item["advice_type"])
+        print(f"✓ {item['advice_type']} 风水建议生成完成")
+        return advice
     
     def post(self, shared, prep_res, exec_res):
-        """将风水建议写入共享存储"""
-        shared["fengshui_advice"] = exec_res
+        """将风水建议按类型写入共享存储"""
+        shared["fengshui_advice"] = {item["advice_type"]: advice for item, advice in zip(prep_res, exec_res)}
         print("✓ 风水建议生成完成")
         return "default"
 
 class DailyQueryNode(Node):
     """日常查询节点"""
     
+    reads = ("user_info", "bazi_result")
+    writes = ("daily_info",)
+    # 查询日期包含在prep结果中，缓存键随日期变化，不会返回过期的运势
+    cache = _node_cache(maxsize=1024, ttl=24 * 3600)
+    
     def prep(self, shared):
         """从共享存储读取用户信息"""
+        from datetime import datetime
+        
         user_info = shared.get("user_info")
         bazi_result = shared.get("bazi_result")
         
@@ -275,7 +463,8 @@ class DailyQueryNode(Node):
         
         return {
             "user_info": user_info,
-            "bazi_result": bazi_result
+            "bazi_result": bazi_result,
+            "query_date": datetime.now().strftime("%Y-%m-%d")
         }
     
     def exec(self, prep_data):
@@ -288,11 +477,11 @@ class DailyQueryNode(Node):
         bazi_result = prep_data["bazi_result"]
         
         # 获取今日运势
-        today = datetime.now().strftime("%Y-%m-%d")
+        today = prep_data["query_date"]
         daily_fortune = get_daily_fortune(today, bazi_result)
         
         # 查找未来30天的吉日
-        end_date = (datetime.now() + timedelta(days=30)).strftime("%Y-%m-%d")
+        end_date = (datetime.strptime(today, "%Y-%m-%d") + timedelta(days=30)).strftime("%Y-%m-%d")
         auspicious_days = find_auspicious_days(today, end_date, "general")
         
         print(f"今日运势 ({today}):")
@@ -317,6 +506,14 @@ class DailyQueryNode(Node):
 class ResultIntegrationNode(Node):
     """结果整合节点"""
     
+    reads = ("user_info", "bazi_result", "analysis_result", "fengshui_advice", "daily_info")
+    writes = ("final_report",)
+    circuit_breaker = LLM_CIRCUIT_BREAKER
+    resources = (llm_resource(),)
+    
+    def __init__(self, **kwargs):
+        super().__init__(**{**LLM_RETRY_POLICY, **kwargs})
+    
     def prep(self, shared):
         """从共享存储读取所有分析结果"""
         required_keys = ["user_info", "bazi_result", "analysis_result", 
@@ -335,7 +532,14 @@ class ResultIntegrationNode(Node):
         print("\n=== 正在生成综合命理报告 ===")
         
         # 使用LLM生成综合报告
-        report_prompt = f"""
+        # LLM调用异常交由节点重试策略处理，最终失败时由exec_fallback使用默认模板
+        llm_response = call_llm(self._build_prompt(prep_data), timeout=LLM_CALL_TIMEOUT)
+        
+        return self._parse_report(prep_data, llm_response)
+    
+    def _build_prompt(self, prep_data):
+        """构造综合报告提示词"""
+        return f"""
 请根据以下信息生成一份完整的风水命理报告，以YAML格式输出：
 
 用户基本信息：
@@ -366,10 +570,10 @@ recommendations:
 
 conclusion: "总结性建议"
 ```"""
-
+    
+    def _parse_report(self, prep_data, llm_response):
+        """解析LLM输出的YAML报告，失败时使用默认模板"""
         try:
-            llm_response = call_llm(report_prompt)
-            
             # 提取YAML内容
             yaml_start = llm_response.find("```yaml")
             yaml_end = llm_response.find("```", yaml_start + 7)
@@ -381,10 +585,18 @@ conclusion: "总结性建议"
             else:
                 report = self._get_default_report(prep_data)
         except Exception as e:
-            print(f"报告生成失败，使用默认模板: {e}")
+            print(f"报告解析失败，使用默认模板: {e}")
             report = self._get_default_report(prep_data)
         
-        # 添加详细数据引用
+        return self._build_report(prep_data, report)
+    
+    def exec_fallback(self, prep_data, exc):
+        """LLM调用最终失败时使用默认报告模板"""
+        print(f"报告生成失败，使用默认模板: {exc}")
+        return self._build_report(prep_data, self._get_default_report(prep_data))
+    
+    def _build_report(self, prep_data, report):
+        """为摘要报告附加详细数据引用"""
         comprehensive_report = {
             "summary_report": report,
             "detailed_data": {
@@ -446,4 +658,326 @@ conclusion: "总结性建议"
         print(f"\n{report['conclusion']}")
         print("="*50)
         
-        return "default"
\ No newline at end of file
+        return "default"
+
+class HedgedFortuneAnalysisNode(HedgedAsyncNode, FortuneAnalysisNode):
+    """命理分析节点（异步对冲请求版本）"""
+    
+    # 每个对冲请求各自占用所发往服务商的配额
+    resources = ()
+    
+    def __init__(self, **kwargs):
+        super().__init__(**{**LLM_HEDGE_POLICY, **kwargs})
+    
+    async def prep_async(self, shared):
+        return self.prep(shared)
+    
+    async def exec_hedge_async(self, prep_data, hedge_index):
+        """发起一次LLM分析请求，被对冲请求抢先时会被取消"""
+        wuxing_analysis = analyze_wuxing(prep_data["bazi_result"])
+        provider = self.hedge_provider(hedge_index)
+        async with resource_pool(llm_resource(provider)).hold_async():
+            llm_response = await call_llm_async(self._build_prompt(prep_data, wuxing_analysis), provider, timeout=LLM_CALL_TIMEOUT)
+        return self._combine_analysis(prep_data, wuxing_analysis, _parse_llm_analysis(llm_response))
+    
+    async def exec_fallback_async(self, prep_data, exc):
+        return self.exec_fallback(prep_data, exc)
+    
+    async def post_async(self, shared, prep_res, exec_res):
+        return self.post(shared, prep_res, exec_res)
+
+class HedgedResultIntegrationNode(HedgedAsyncNode, ResultIntegrationNode):
+    """结果整合节点（异步对冲请求版本）"""
+    
+    # 每个对冲请求各自占用所发往服务商的配额
+    resources = ()
+    
+    def __init__(self, **kwargs):
+        super().__init__(**{**LLM_HEDGE_POLICY, **kwargs})
+    
+    async def prep_async(self, shared):
+        return self.prep(shared)
+    
+    async def exec_hedge_async(self, prep_data, hedge_index):
+        """发起一次综合报告请求，被对冲请求抢先时会被取消"""
+        provider = self.hedge_provider(hedge_index)
+        async with resource_pool(llm_resource(provider)).hold_async():
+            llm_response = await call_llm_async(self._build_prompt(prep_data), provider, timeout=LLM_CALL_TIMEOUT)
+        return self._parse_report(prep_data, llm_response)
+    
+    async def exec_fallback_async(self, prep_data, exc):
+        return self.exec_fallback(prep_data, exc)
+    
+    async def post_async(self, shared, prep_res, exec_res):
+        return self.post(shared, prep_res, exec_res)
+
+class SingleShotAnalysisNode(FortuneAnalysisNode):
+    """命理分析与综合报告合并节点：一次LLM调用同时输出命理分析和摘要报告，省去第二次LLM往返"""
+    
+    reads = ("user_info", "bazi_result", "daily_info")
+    writes = ("analysis_result", "summary_report")
+    # 报告包含查询日期，不能按八字签名缓存
+    cache = None
+    
+    def prep(self, shared):
+        """读取八字、用户信息和当日运势"""
+        prep_data = super().prep(shared)
+        if not shared.get("daily_info"):
+            raise ValueError("缺少必要数据: daily_info")
+        prep_data["daily_info"] = shared["daily_info"]
+        return prep_data
+    
+    def exec(self, prep_data):
+        """一次调用LLM生成命理分析和综合报告"""
+        print("\n=== 正在进行命理分析并生成综合报告 ===")
+        
+        wuxing_analysis = analyze_wuxing(prep_data["bazi_result"])
+        llm_response = call_llm(self._build_prompt(prep_data, wuxing_analysis), timeout=LLM_CALL_TIMEOUT)
+        llm_analysis = _parse_llm_analysis(llm_response)
+        
+        return {
+            "analysis_result": self._combine_analysis(prep_data, wuxing_analysis, llm_analysis),
+            "summary_report": llm_analysis.get("report")
+        }
+    
+    def _build_prompt(self, prep_data, wuxing_analysis):
+        """构造合并的命理分析与综合报告提示词"""
+        bazi_result = prep_data["bazi_result"]
+        user_info = prep_data["user_info"]
+        daily_info = prep_data["daily_info"]
+        
+        return f"""
+请根据以下八字信息进行命理分析，并生成一份综合报告，以YAML格式输出：
+
+用户信息：
+- 姓名：{NAME_PLACEHOLDER}（称呼用户时请原样保留此占位符）
+- 性别：{user_info['gender']}
+- 生肖：{bazi_result['zodiac']}
+
+八字信息：
+- 年柱：{bazi_result['year_pillar']}
+- 月柱：{bazi_result['month_pillar']}
+- 日柱：{bazi_result['day_pillar']}
+- 时柱：{bazi_result['hour_pillar']}
+
+五行分析：
+- 五行强弱：{wuxing_analysis['wuxing_strength']}
+- 喜用神：{wuxing_analysis['favorable_elements']}
+- 忌神：{wuxing_analysis['unfavorable_elements']}
+- 五行平衡分数：{wuxing_analysis['balance_score']}
+
+今日运势评分：{daily_info['today_fortune']['overall_score']}
+
+请在同一个YAML代码块中提供命理分析和综合报告（请输出中文）：
+
+```yaml
+personality:
+  traits: ["性格特点1", "性格特点2", "性格特点3"]
+  strengths: ["优点1", "优点2"]
+  weaknesses: ["需要注意的方面1", "需要注意的方面2"]
+
+fortune:
+  career: "事业运势分析"
+  wealth: "财富运势分析"
+  health: "健康运势分析"
+  relationship: "感情运势分析"
+
+lucky_elements:
+  colors: ["幸运颜色1", "幸运颜色2"]
+  numbers: [幸运数字1, 幸运数字2]
+  directions: ["有利方位1", "有利方位2"]
+
+life_advice:
+  - "人生建议1"
+  - "人生建议2"
+  - "人生建议3"
+
+report:
+  summary:
+    title: "个人命理风水综合报告"
+    user_name: "{NAME_PLACEHOLDER}"
+    generation_date: "{daily_info['query_date']}"
+  overview:
+    bazi_summary: "八字简要说明"
+    wuxing_summary: "五行特点总结"
+    fortune_summary: "整体运势概述"
+  recommendations:
+    daily_practice: ["日常建议1", "日常建议2"]
+    feng_shui_tips: ["风水建议1", "风水建议2"]
+    lucky_items: ["幸运物品1", "幸运物品2"]
+  conclusion: "总结性建议"
+```"""
+    
+    def exec_fallback(self, prep_data, exc):
+        """LLM不可用时使用传统算法分析，报告由ReportAssemblyNode使用默认模板"""
+        return {
+            "analysis_result": super().exec_fallback(prep_data, exc),
+            "summary_report": None
+        }
+    
+    def post(self, shared, prep_res, exec_res):
+        """将姓名占位符替换为用户姓名后写入分析结果和摘要报告"""
+        name = prep_res["user_info"]["name"]
+        shared["analysis_result"] = personalize(exec_res["analysis_result"], name)
+        shared["summary_report"] = personalize(exec_res["summary_report"], name)
+        print("✓ 命理分析与摘要报告完成")
+        return "default"
+
+class ReportAssemblyNode(ResultIntegrationNode):
+    """报告组装节点：使用SingleShotAnalysisNode已生成的摘要报告组装最终报告，不调用LLM"""
+    
+    reads = ResultIntegrationNode.reads + ("summary_report",)
+    circuit_breaker = None
+    resources = ()
+    
+    def __init__(self, **kwargs):
+        Node.__init__(self, **kwargs)
+    
+    def prep(self, shared):
+        prep_data = super().prep(shared)
+        prep_data["summary_report"] = shared.get("summary_report")
+        return prep_data
+    
+    def exec(self, prep_data):
+        """附加详细数据；摘要报告缺失（LLM降级或解析失败）时使用默认模板"""
+        return self._build_report(prep_data, prep_data["summary_report"] or self._get_default_report(prep_data))
+
+# 工作进程内的黄历缓存：黄历只取决于日期，由进程初始化函数预先填充
+_cohort_fortune_cache = {}
+
+def warm_cohort_worker(dates):
+    """进程池工作进程初始化：预先计算目标日期的黄历，避免每条记录重复计算"""
+    from utils.traditional_calendar import get_traditional_fortune
+    for date in dates:
+        _cohort_fortune_cache[date] = get_traditional_fortune(date)
+
+class CohortRecomputeNode(ProcessPoolBatchNode):
+    """客户群批量重算节点（多进程）"""
+    
+    reads = ("cohort_records",)
+    writes = ("cohort_results",)
+    
+    def __init__(self, fortune_date=None, max_workers=None, chunksize=256):
+        from datetime import datetime
+        
+        self.fortune_date = fortune_date or datetime.now().strftime("%Y-%m-%d")
+        super().__init__(
+            max_workers=max_workers,
+            chunksize=chunksize,
+            initializer=warm_cohort_worker,
+            initargs=((self.fortune_date,),)
+        )
+    
+    def prep(self, shared):
+        """从共享存储读取待重算的用户信息列表"""
+        return shared.get("cohort_records", [])
+    
+    def exec(self, user_info):
+        """计算单个客户的八字、五行与当日黄历"""
+        from utils.traditional_calendar import get_traditional_fortune
+        
+        bazi_result = calculate_bazi(
+            user_info["birth_date"],
+            user_info["gender"],
+            user_info.get("location", "北京")
+        )
+        daily_fortune = _cohort_fortune_cache.get(self.fortune_date)
+        if daily_fortune is None:
+            daily_fortune = _cohort_fortune_cache[self.fortune_date] = get_traditional_fortune(self.fortune_date)
+        
+        return {
+            "user_id": user_info.get("user_id"),
+            "bazi_result": bazi_result,
+            "wuxing_analysis": analyze_wuxing(bazi_result),
+            "daily_fortune": daily_fortune
+        }
+    
+    def post(self, shared, prep_res, exec_res):
+        """将批量结果写入共享存储"""
+        shared["cohort_results"] = exec_res
+        print(f"✓ 客户群重算完成，共 {len(exec_res)} 条")
+        return "default"
+
+class FragmentPrecomputeNode(ThreadPoolBatchNode):
+    """命理分析片段预生成节点（离线批处理，多线程并发调用LLM）"""
+    
+    reads = ("fragments", "force")
+    writes = ("fragments", "fragment_failures")
+    circuit_breaker = LLM_CIRCUIT_BREAKER
+    resources = (llm_resource(),)
+    
+    def __init__(self, max_workers=8, **kwargs):
+        super().__init__(max_workers=max_workers, **{**LLM_RETRY_POLICY, **kwargs})
+    
+    def prep(self, shared):
+        """列出尚未生成的片段（force为真时全部重新生成）"""
+        fragments = shared.setdefault("fragments", {table: dict(entries) for table, entries in load_fragments().items()})
+        if shared.get("force"):
+            return precompute_items()
+        table = {"core": fragments["core"], "element": fragments["elements"]}
+        return [item for item in precompute_items() if item["key"] not in table[item["kind"]]]
+    
+    def exec(self, item):
+        """调用LLM生成一个片段，输出缺少必要字段时抛出异常以触发重试"""
+        fragment = _parse_yaml_block(call_llm(self._build_prompt(item), timeout=LLM_CALL_TIMEOUT))
+        required = ("personality", "fortune", "life_advice") if item["kind"] == "core" else ("favorable", "unfavorable")
+        if not isinstance(fragment, dict) or any(field not in fragment for field in required):
+            raise ValueError(f"片段 {item['key']} 格式不完整")
+        print(f"✓ 片段 {item['key']} 生成完成")
+        return fragment
+    
+    def exec_fallback(self, item, exc):
+        """单个片段失败不影响整批，留待下次运行补齐"""
+        print(f"片段 {item['key']} 生成失败: {exc}")
+        return None
+    
+    def _build_prompt(self, item):
+        """构造片段生成提示词"""
+        if item["kind"] == "core":
+            stem, branch = item["day_stem"], item["month_branch"]
+            return f"""
+请针对日主为{stem}（{STEM_ELEMENTS[stem]}）、生于{branch}月（{BRANCH_SEASONS[branch]}季）的命局，给出通用的命理解读，以YAML格式输出（请输出中文，不要提及具体姓名）：
+
+```yaml
+personality:
+  traits: ["性格特点1", "性格特点2", "性格特点3"]
+  strengths: ["优点1", "优点2"]
+  weaknesses: ["需要注意的方面1", "需要注意的方面2"]
+
+fortune:
+  career: "事业运势分析"
+  wealth: "财富运势分析"
+  health: "健康运势分析"
+  relationship: "感情运势分析"
+
+life_advice:
+  - "人生建议1"
+  - "人生建议2"
+  - "人生建议3"
+```"""
+        element = item["element"]
+        return f"""
+请分别给出五行中的"{element}"作为喜用神和作为忌神时的人生建议，以YAML格式输出（请输出中文，每条建议一句话）：
+
+```yaml
+favorable:
+  - "{element}为喜用神时的建议1"
+  - "{element}为喜用神时的建议2"
+unfavorable:
+  - "{element}为忌神时的建议1"
+  - "{element}为忌神时的建议2"
+```"""
+    
+    def post(self, shared, prep_res, exec_res):
+        """将生成成功的片段合并进片段表，失败的记录下来"""
+        fragments = shared["fragments"]
+        table = {"core": fragments["core"], "element": fragments["elements"]}
+        failures = []
+        for item, fragment in zip(prep_res, exec_res):
+            if fragment is None:
+                failures.append(item["key"])
+            else:
+                table[item["kind"]][item["key"]] = fragment
+        shared["fragment_failures"] = failures
+        print(f"✓ 片段预生成完成：成功 {len(prep_res) - len(failures)} 个，失败 {len(failures)} 个")
+        return "default"
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+命理分析片段离线预生成脚本
+为 日主天干 × 月令地支（120种）以及五个五行的喜忌建议调用LLM生成分析片段，保存为JSON文件。
+服务端设置 ANALYSIS_MODE=fragments 后，命理分析直接由这些片段合成。
+已生成的片段会被跳过，可重复运行以补齐失败的部分。
+
+用法:
+    python precompute_fragments.py --workers 8
+    python precompute_fragments.py --output ./data/analysis_fragments.json --force
+"""
+
+import argparse
+import sys
+
+from flow import create_fragment_precompute_flow
+from utils.analysis_fragments import fragments_path, load_fragments, save_fragments
+
+def main():
+    parser = argparse.ArgumentParser(description="预生成命理分析片段")
+    parser.add_argument("--workers", type=int, default=8, help="并发LLM调用数（默认8，同时受LLM配额限制）")
+    parser.add_argument("--output", default=fragments_path(), help="片段文件路径（默认ANALYSIS_FRAGMENTS_PATH或data/analysis_fragments.json）")
+    parser.add_argument("--force", action="store_true", help="忽略已有片段，全部重新生成")
+    args = parser.parse_args()
+
+    shared = {
+        "fragments": {table: dict(entries) for table, entries in load_fragments(args.output).items()},
+        "force": args.force
+    }
+
+    print(f"开始预生成命理分析片段 -> {args.output}")
+    create_fragment_precompute_flow(max_workers=args.workers).run(shared)
+    save_fragments(shared["fragments"], args.output)
+
+    fragments = shared["fragments"]
+    print(f"✓ 已保存：核心片段 {len(fragments['core'])}/120，五行片段 {len(fragments['elements'])}/5")
+    if shared["fragment_failures"]:
+        print(f"⚠️ 以下片段生成失败，请稍后重新运行补齐: {', '.join(shared['fragment_failures'])}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+流程性能剖析脚本
+对flow.py中的任意流程重复运行N次（默认使用模拟LLM），统计各节点耗时分布（p50/p95/p99），
+计算关键路径，并估算每个节点被缓存或并行化后的理论加速比，结果可导出为JSON、DOT或Mermaid
+
+用法:
+    python profile_flow.py fengshui_analysis --runs 20 --format mermaid
+    python profile_flow.py bazi_only --shared recorded_shared.json --format dot --output bazi.dot
+"""
+
+import argparse
+import asyncio
+import contextlib
+import copy
+import io
+import json
+import math
+import random
+import statistics
+import sys
+import time
+
+import flow as flow_module
+import nodes
+from macore import Tracer, AsyncFlow, DagFlow
+from utils.call_llm_with_mock import generate_mock_response
+
+# 默认输入：与 /api/analyze/complete 构造的共享存储一致
+SAMPLE_SHARED = {
+    "user_info": {
+        "name": "测试用户",
+        "birth_date": {"year": 1990, "month": 5, "day": 15, "hour": 14},
+        "gender": "male",
+        "location": "北京"
+    },
+    "service_type": "profile"
+}
+
+def available_flows():
+    """flow.py 中所有 create_<name>_flow 工厂函数，按 <name> 索引"""
+    return {
+        name[len("create_"):-len("_flow")]: factory
+        for name, factory in vars(flow_module).items()
+        if name.startswith("create_") and name.endswith("_flow") and callable(factory)
+    }
+
+@contextlib.contextmanager
+def mock_llm(latency):
+    """将节点使用的LLM调用替换为模拟响应，每次调用耗时在 latency 的 0.5~1.5 倍之间随机"""
+    def fake_call_llm(prompt, provider=None, timeout=None):
+        time.sleep(latency * random.uniform(0.5, 1.5))
+        return generate_mock_response(prompt)
+
+    async def fake_call_llm_async(prompt, provider=None, timeout=None):
+        await asyncio.sleep(latency * random.uniform(0.5, 1.5))
+        return generate_mock_response(prompt)
+
+    original = nodes.call_llm, nodes.call_llm_async
+    nodes.call_llm, nodes.call_llm_async = fake_call_llm, fake_call_llm_async
+    try:
+        yield
+    finally:
+        nodes.call_llm, nodes.call_llm_async = original
+
+def percentile(values, q):
+    """最近秩法百分位数，values 需已排序"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+def distribution(values):
+    values = sorted(values)
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": statistics.fmean(values) if values else 0.0
+    }
+
+def flow_graph(flow):
+    """流程的节点列表和边 (from, to, label)：DagFlow 按数据依赖，普通 Flow 按后继关系"""
+    if isinstance(flow, DagFlow):
+        graph = list(flow.nodes)
+        edges = [(j, i, "") for i, deps in enumerate(flow.dependencies()) for j in sorted(deps)]
+    else:
+        graph = flow._graph()
+        index = {id(n): i for i, n in enumerate(graph)}
+        edges = [(index[id(n)], index[id(m)], "" if action == "default" else action)
+                 for n in graph for action, m in n.successors.items()]
+    return graph, edges
+
+def node_timings(tracer, graph):
+    """一次运行中各节点的耗时（毫秒）和执行顺序；同类型节点按开始时间依次对应"""
+    root = next(s for s in tracer.spans if s["parent"] is None)
+    children = sorted((s for s in tracer.spans if s["parent"] == root["id"]), key=lambda s: s["start"])
+    timings, order, used = {}, [], set()
+    for span in children:
+        for i, node in enumerate(graph):
+            if i not in used and type(node).__name__ == span["name"]:
+                used.add(i)
+                timings[i] = (span["end"] - span["start"]) * 1000
+                order.append(i)
+                break
+    return (root["end"] - root["start"]) * 1000, timings, order
+
+def makespan(weights, preds, order):
+    """按依赖关系计算完成总耗时和关键路径；order 为拓扑序"""
+    finish, via = {}, {}
+    for i in order:
+        before = max((p for p in preds[i] if p in finish), key=lambda p: finish[p], default=None)
+        finish[i] = weights.get(i, 0.0) + (finish[before] if before is not None else 0.0)
+        via[i] = before
+    if not finish:
+        return 0.0, []
+    node = max(finish, key=finish.get)
+    total, path = finish[node], []
+    while node is not None:
+        path.append(node)
+        node = via[node]
+    return total, path[::-1]
+
+def profile_flow(flow, shared, runs=10, keep_cache=False):
+    """运行流程 runs 次并汇总剖析报告"""
+    graph, edges = flow_graph(flow)
+    if not keep_cache:
+        for node in graph:
+            node.cache = None
+    flow.tracer = Tracer()
+    walls, samples, orders = [], {i: [] for i in range(len(graph))}, []
+
+    for _ in range(runs):
+        flow.tracer.clear()
+        run_shared = copy.deepcopy(shared)
+        with contextlib.redirect_stdout(io.StringIO()):
+            if isinstance(flow, AsyncFlow):
+                asyncio.run(flow.run_async(run_shared))
+            else:
+                flow.run(run_shared)
+        wall, timings, order = node_timings(flow.tracer, graph)
+        walls.append(wall)
+        orders.append(tuple(order))
+        for i, ms in timings.items():
+            samples[i].append(ms)
+
+    stats = {i: distribution(v) for i, v in samples.items() if v}
+    weights = {i: s["mean"] for i, s in stats.items()}
+
+    # DagFlow 按依赖并行；普通 Flow 的节点串行执行，沿最常见的执行顺序建模
+    if isinstance(flow, DagFlow):
+        order = list(range(len(graph)))
+        preds = {i: {j for j, k, _ in edges if k == i} for i in order}
+    else:
+        order = list(max(set(orders), key=orders.count))
+        preds = {i: ({order[n - 1]} if n else set()) for n, i in enumerate(order)}
+
+    total, path = makespan(weights, preds, order)
+    report_nodes = []
+    for i, node in enumerate(graph):
+        entry = {"id": i, "name": type(node).__name__, "samples": len(samples[i]), **stats.get(i, {})}
+        if i in weights and total:
+            cached, _ = makespan({**weights, i: 0.0}, preds, order)
+            rest, _ = makespan({**weights, i: 0.0},
+                               {k: v - {i} for k, v in preds.items() if k != i} | {i: set()}, order)
+            entry["on_critical_path"] = i in path
+            entry["speedup_if_cached"] = total / cached if cached else None  # 缓存后流程耗时可忽略
+            entry["speedup_if_parallel"] = total / max(rest, weights[i])
+        report_nodes.append(entry)
+
+    return {
+        "flow": type(flow).__name__,
+        "runs": runs,
+        "wall_ms": distribution(walls),
+        "modelled_ms": total,
+        "critical_path": [type(graph[i]).__name__ for i in path],
+        "critical_path_ids": path,
+        "nodes": report_nodes,
+        "edges": [{"from": a, "to": b, "label": label} for a, b, label in edges]
+    }
+
+def _node_label(node):
+    if "p50" not in node:
+        return f"{node['name']}\\n(未执行)"
+    return f"{node['name']}\\np50 {node['p50']:.0f}ms · p95 {node['p95']:.0f}ms · p99 {node['p99']:.0f}ms"
+
+def to_dot(report):
+    """Graphviz DOT：关键路径上的节点和边标红"""
+    critical = set(report["critical_path_ids"])
+    critical_edges = set(zip(report["critical_path_ids"], report["critical_path_ids"][1:]))
+    lines = [f'digraph "{report["flow"]}" {{', "  rankdir=LR;", "  node [shape=box, fontname=\"Helvetica\"];"]
+    for node in report["nodes"]:
+        style = ', color="#d33", penwidth=2' if node["id"] in critical else ""
+        lines.append(f'  n{node["id"]} [label="{_node_label(node)}"{style}];')
+    for edge in report["edges"]:
+        attrs = [f'label="{edge["label"]}"'] if edge["label"] else []
+        if (edge["from"], edge["to"]) in critical_edges:
+            attrs.append('color="#d33", penwidth=2')
+        lines.append(f'  n{edge["from"]} -> n{edge["to"]}' + (f' [{", ".join(attrs)}]' if attrs else "") + ";")
+    lines.append("}")
+    return "\n".join(lines)
+
+def to_mermaid(report):
+    """Mermaid flowchart：关键路径上的节点加红框"""
+    lines = ["flowchart LR"]
+    for node in report["nodes"]:
+        lines.append(f'  n{node["id"]}["{_node_label(node).replace(chr(92) + "n", "<br/>")}"]')
+    for edge in report["edges"]:
+        arrow = f'-->|{edge["label"]}|' if edge["label"] else "-->"
+        lines.append(f'  n{edge["from"]} {arrow} n{edge["to"]}')
+    for node in report["nodes"]:
+        if node.get("on_critical_path"):
+            lines.append(f'  style n{node["id"]} stroke:#d33,stroke-width:3px')
+    return "\n".join(lines)
+
+def _speedup(value):
+    return "∞" if value is None else f"{value:.2f}x"
+
+def format_summary(report):
+    """终端输出的文字摘要"""
+    wall = report["wall_ms"]
+    lines = [
+        f"流程 {report['flow']}，运行 {report['runs']} 次",
+        f"总耗时: p50 {wall['p50']:.0f}ms  p95 {wall['p95']:.0f}ms  p99 {wall['p99']:.0f}ms（模型估算 {report['modelled_ms']:.0f}ms）",
+        f"关键路径: {' -> '.join(report['critical_path'])}",
+        "",
+        f"{'节点':<32}{'p50(ms)':>9}{'p95(ms)':>9}{'p99(ms)':>9}{'缓存加速':>8}{'并行加速':>8}"
+    ]
+    ranked = sorted(report["nodes"], key=lambda n: n.get("speedup_if_cached") or float("inf") if "p50" in n else 0, reverse=True)
+    for node in ranked:
+        if "p50" not in node:
+            continue
+        mark = "*" if node.get("on_critical_path") else " "
+        lines.append(f"{mark}{node['name']:<31}{node['p50']:>9.0f}{node['p95']:>9.0f}{node['p99']:>9.0f}"
+                     f"{_speedup(node['speedup_if_cached']):>12}{_speedup(node['speedup_if_parallel']):>12}")
+    lines.append("（* 关键路径上的节点）")
+    return "\n".join(lines)
+
+def main():
+    flows = available_flows()
+    parser = argparse.ArgumentParser(description="macore 流程关键路径剖析")
+    parser.add_argument("flow", choices=sorted(flows), help="flow.py 中的流程名（create_<name>_flow）")
+    parser.add_argument("--runs", type=int, default=10, help="运行次数（默认10）")
+    parser.add_argument("--shared", help="录制的共享存储输入（JSON文件），默认使用示例用户")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="模拟LLM调用的平均耗时（秒，默认1.0）")
+    parser.add_argument("--real-llm", action="store_true", help="使用真实LLM调用而不是模拟响应")
+    parser.add_argument("--keep-cache", action="store_true", help="保留节点缓存（默认关闭以测量真实耗时）")
+    parser.add_argument("--format", choices=["text", "json", "dot", "mermaid"], default="text", help="输出格式")
+    parser.add_argument("--output", help="输出文件，默认打印到终端")
+    args = parser.parse_args()
+
+    shared = SAMPLE_SHARED
+    if args.shared:
+        with open(args.shared, "r", encoding="utf-8") as f:
+            shared = json.load(f)
+
+    flow = flows[args.flow]()
+    llm = contextlib.nullcontext() if args.real_llm else mock_llm(args.llm_latency)
+    with llm:
+        report = profile_flow(flow, shared, runs=args.runs, keep_cache=args.keep_cache)
+
+    render = {
+        "text": format_summary,
+        "json": lambda r: json.dumps(r, ensure_ascii=False, indent=2),
+        "dot": to_dot,
+        "mermaid": to_mermaid
+    }[args.format]
+    output = render(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"✓ 剖析报告已保存到 {args.output}")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+八字签名分析缓存
+命理分析只取决于四柱和性别，不同用户只要八字相同即可复用同一份LLM分析。
+缓存中的分析不含真实姓名（提示词使用姓名占位符），取出后再替换为当前用户的姓名。
+"""
+
+import os
+from macore import stable_hash
+from utils.cache_store import open_cache
+
+# 提示词与缓存内容中的姓名占位符
+NAME_PLACEHOLDER = "{{姓名}}"
+
+_GENDERS = {"male": "male", "男": "male", "m": "male", "female": "female", "女": "female", "f": "female"}
+
+def bazi_signature(bazi_result, gender):
+    """
+    规范化的八字签名：四柱 + 性别
+
+    Args:
+        bazi_result (dict): calculate_bazi 的结果
+        gender (str): 性别（male/female 或 男/女）
+
+    Returns:
+        tuple: (年柱, 月柱, 日柱, 时柱, 性别)
+    """
+    pillars = tuple(str(bazi_result[k]).strip() for k in ("year_pillar", "month_pillar", "day_pillar", "hour_pillar"))
+    gender = str(gender).strip().lower()
+    return pillars + (_GENDERS.get(gender, gender),)
+
+def signature_key(bazi_result, gender):
+    """八字签名的缓存键"""
+    return stable_hash(bazi_signature(bazi_result, gender))
+
+def personalize(analysis, name):
+    """将分析结果中的姓名占位符替换为用户姓名（返回新对象，不修改缓存中的内容）"""
+    if isinstance(analysis, str):
+        return analysis.replace(NAME_PLACEHOLDER, name)
+    if isinstance(analysis, dict):
+        return {k: personalize(v, name) for k, v in analysis.items()}
+    if isinstance(analysis, list):
+        return [personalize(v, name) for v in analysis]
+    return analysis
+
+def _create_cache():
+    """设置ANALYSIS_CACHE_PATH时使用SQLite文件（多进程共享、重启保留），否则使用进程内LRU"""
+    ttl = float(os.getenv("ANALYSIS_CACHE_TTL", str(30 * 24 * 3600)))
+    return open_cache(os.getenv("ANALYSIS_CACHE_PATH"), maxsize=int(os.getenv("ANALYSIS_CACHE_SIZE", "100000")), ttl=ttl,
+                      memory_maxsize=int(os.getenv("ANALYSIS_CACHE_SIZE", "10000")))
+
+# 进程内共享的分析缓存，FortuneAnalysisNode 以八字签名为键使用
+ANALYSIS_CACHE = _create_cache()
+
+def analysis_cache_stats():
+    """各节点的命中情况和缓存条目数"""
+    return {
+        "entries": len(ANALYSIS_CACHE),
+        "nodes": {
+            name: {**counts, "hit_rate": ANALYSIS_CACHE.hit_rate(name)}
+            for name, counts in list(ANALYSIS_CACHE.stats.items())
+        }
+    }
@@ -0,0 +1,99 @@
+"""
+预计算命理分析片段
+命理分析的核心解读主要由日主天干 × 月令地支（10 × 12 = 120种组合）决定，
+喜用神与忌神的建议则按单个五行（5种）预先生成。离线批量生成后保存为JSON文件，
+请求时按用户八字取出对应片段合成为与LLM分析相同结构的结果，无需实时调用LLM。
+"""
+
+import json
+import os
+
+DAY_STEMS = ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"]
+MONTH_BRANCHES = ["子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥"]
+ELEMENTS = ["木", "火", "土", "金", "水"]
+
+STEM_ELEMENTS = {
+    "甲": "木", "乙": "木", "丙": "火", "丁": "火", "戊": "土",
+    "己": "土", "庚": "金", "辛": "金", "壬": "水", "癸": "水"
+}
+BRANCH_SEASONS = {
+    "寅": "春", "卯": "春", "辰": "春", "巳": "夏", "午": "夏", "未": "夏",
+    "申": "秋", "酉": "秋", "戌": "秋", "亥": "冬", "子": "冬", "丑": "冬"
+}
+
+DEFAULT_FRAGMENTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "analysis_fragments.json")
+
+def fragments_path():
+    """片段文件路径，可通过ANALYSIS_FRAGMENTS_PATH指定"""
+    return os.getenv("ANALYSIS_FRAGMENTS_PATH", DEFAULT_FRAGMENTS_PATH)
+
+def core_key(bazi_result):
+    """核心片段键：日主天干 + 月令地支，如 "甲寅" """
+    return bazi_result["day_pillar"][0] + bazi_result["month_pillar"][1]
+
+def precompute_items():
+    """需要预生成的全部片段：120个核心组合 + 5个五行"""
+    items = [
+        {"kind": "core", "key": stem + branch, "day_stem": stem, "month_branch": branch}
+        for stem in DAY_STEMS for branch in MONTH_BRANCHES
+    ]
+    items += [{"kind": "element", "key": element, "element": element} for element in ELEMENTS]
+    return items
+
+def empty_fragments():
+    return {"core": {}, "elements": {}}
+
+_loaded = {}
+
+def load_fragments(path=None):
+    """读取片段文件（按文件修改时间缓存）；文件不存在时返回空片段表"""
+    path = path or fragments_path()
+    if not os.path.exists(path):
+        return empty_fragments()
+    mtime = os.path.getmtime(path)
+    if path not in _loaded or _loaded[path][0] != mtime:
+        with open(path, "r", encoding="utf-8") as f:
+            _loaded[path] = (mtime, {**empty_fragments(), **json.load(f)})
+    return _loaded[path][1]
+
+def save_fragments(fragments, path=None):
+    """写入片段文件（先写临时文件再替换，避免服务读到半个文件）"""
+    path = path or fragments_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(fragments, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def compose_analysis(bazi_result, wuxing_analysis, fragments=None):
+    """
+    按八字合成命理分析
+
+    Args:
+        bazi_result (dict): 八字计算结果
+        wuxing_analysis (dict): analyze_wuxing 的结果
+        fragments (dict): 片段表，默认读取片段文件
+
+    Returns:
+        dict: 与 FortuneAnalysisNode 输出结构相同的分析；缺少对应核心片段时返回None
+    """
+    fragments = fragments or load_fragments()
+    core = fragments["core"].get(core_key(bazi_result))
+    if core is None:
+        return None
+
+    elements = fragments["elements"]
+    life_advice = list(core.get("life_advice", []))
+    for element in wuxing_analysis["favorable_elements"]:
+        life_advice += elements.get(element, {}).get("favorable", [])
+    for element in wuxing_analysis["unfavorable_elements"]:
+        life_advice += elements.get(element, {}).get("unfavorable", [])
+
+    return {
+        "wuxing_analysis": wuxing_analysis,
+        "personality": core.get("personality", {}),
+        "fortune": core.get("fortune", {}),
+        "lucky_elements": dict(wuxing_analysis["recommendations"]),
+        "life_advice": life_advice,
+        "balance_score": wuxing_analysis["balance_score"]
+    }
@@ -0,0 +1,35 @@
+"""
+结果缓存的创建
+配置了SQLite文件路径时使用文件缓存（多进程共享、重启保留），否则使用进程内LRU。
+缓存在模块导入时创建，文件无法打开时退回进程内缓存并记录警告，避免整个服务无法启动。
+"""
+
+import logging
+import os
+import sqlite3
+from macore import MemoryCache, SQLiteCache
+
+logger = logging.getLogger(__name__)
+
+def open_cache(path, maxsize, ttl, memory_maxsize=None):
+    """
+    创建结果缓存
+
+    Args:
+        path (str): SQLite文件路径，为空时使用进程内缓存
+        maxsize (int): 最大条目数
+        ttl (float): 过期秒数
+        memory_maxsize (int): 进程内缓存的最大条目数，默认与maxsize相同
+
+    Returns:
+        NodeCache: SQLiteCache 或 MemoryCache
+    """
+    memory_maxsize = memory_maxsize or maxsize
+    if not path:
+        return MemoryCache(maxsize=memory_maxsize, ttl=ttl)
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return SQLiteCache(path, maxsize=maxsize, ttl=ttl)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"无法打开缓存文件 {path}，改用进程内缓存: {e}")
+        return MemoryCache(maxsize=memory_maxsize, ttl=ttl)
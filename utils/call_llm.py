@@ -6,7 +6,11 @@ import dotenv
 dotenv.load_dotenv('.env.local')
 dotenv.load_dotenv('.env')
 
-def call_llm(prompt: str, provider: Optional[str] = None) -> str:
+def _client_timeout(timeout: Optional[float]) -> dict:
+    """OpenAI client kwargs for timeout; an explicit timeout=None would disable the SDK's default timeout"""
+    return {} if timeout is None else {"timeout": timeout}
+
+def call_llm(prompt: str, provider: Optional[str] = None, timeout: Optional[float] = None) -> str:
     """
     Call LLM with support for multiple providers.
     
@@ -14,6 +18,8 @@ def call_llm(prompt: str, provider: Optional[str] = None) -> str:
         prompt: The prompt to send to the LLM
         provider: LLM provider to use ('openai', 'gemini', 'deepseek'). 
                  If None, uses LLM_PROVIDER env var or defaults to 'openai'
+        timeout: HTTP request timeout in seconds (None: the client's default).
+                 The request is aborted and the provider's timeout error raised
     
     Returns:
         The LLM response as a string
@@ -28,7 +34,7 @@ def call_llm(prompt: str, provider: Optional[str] = None) -> str:
         if not api_key:
             raise ValueError("❌ OPENAI_API_KEY not found in environment variables. Please set API key to use LLM features.")
         
-        client = OpenAI(api_key=api_key)
+        client = OpenAI(api_key=api_key, **_client_timeout(timeout))
         model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
         
         response = client.chat.completions.create(
@@ -49,7 +55,7 @@ def call_llm(prompt: str, provider: Optional[str] = None) -> str:
         
         genai.configure(api_key=api_key)
         model = genai.GenerativeModel(os.getenv("GEMINI_MODEL", "gemini-2.5-flash"))
-        response = model.generate_content(prompt)
+        response = model.generate_content(prompt, request_options={"timeout": timeout} if timeout else None)
         return response.text
     
     elif provider == "deepseek":
@@ -61,7 +67,8 @@ def call_llm(prompt: str, provider: Optional[str] = None) -> str:
         # DeepSeek uses OpenAI-compatible API
         client = OpenAI(
             api_key=api_key,
-            base_url="https://api.deepseek.com/v1"
+            base_url="https://api.deepseek.com/v1",
+            **_client_timeout(timeout)
         )
         model = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
         
@@ -74,6 +81,63 @@ def call_llm(prompt: str, provider: Optional[str] = None) -> str:
     else:
         raise ValueError(f"Unsupported provider: {provider}. Choose from: openai, gemini, deepseek")
 
+async def call_llm_async(prompt: str, provider: Optional[str] = None, timeout: Optional[float] = None) -> str:
+    """
+    Async variant of call_llm. Cancelling the awaiting task aborts the in-flight HTTP request.
+    
+    Args:
+        prompt: The prompt to send to the LLM
+        provider: LLM provider to use ('openai', 'gemini', 'deepseek'). 
+                 If None, uses LLM_PROVIDER env var or defaults to 'openai'
+        timeout: HTTP request timeout in seconds (None: the client's default).
+                 The request is aborted and the provider's timeout error raised
+    
+    Returns:
+        The LLM response as a string
+    """
+    if provider is None:
+        provider = os.getenv("LLM_PROVIDER", "openai").lower()
+    
+    if provider in ("openai", "deepseek"):
+        from openai import AsyncOpenAI
+        key_name = "OPENAI_API_KEY" if provider == "openai" else "DEEPSEEK_API_KEY"
+        api_key = os.getenv(key_name)
+        if not api_key:
+            raise ValueError(f"❌ {key_name} not found in environment variables. Please set API key to use LLM features.")
+        
+        if provider == "openai":
+            client = AsyncOpenAI(api_key=api_key, **_client_timeout(timeout))
+            model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        else:
+            # DeepSeek uses OpenAI-compatible API
+            client = AsyncOpenAI(api_key=api_key, base_url="https://api.deepseek.com/v1", **_client_timeout(timeout))
+            model = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
+        
+        async with client:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}]
+            )
+        return response.choices[0].message.content
+    
+    elif provider == "gemini":
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            raise ImportError("Please install google-generativeai: pip install google-generativeai")
+        
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("❌ GEMINI_API_KEY not found in environment variables. Please set API key to use LLM features.")
+        
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel(os.getenv("GEMINI_MODEL", "gemini-2.5-flash"))
+        response = await model.generate_content_async(prompt, request_options={"timeout": timeout} if timeout else None)
+        return response.text
+    
+    else:
+        raise ValueError(f"Unsupported provider: {provider}. Choose from: openai, gemini, deepseek")
+
 if __name__ == "__main__":
     # Test with different providers
     test_prompt = "Hello, how are you? Please respond in one sentence."
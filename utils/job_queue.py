@@ -0,0 +1,88 @@
+"""
+后台任务队列
+耗时的分析在独立的有界线程池中执行，提交后立即返回任务ID，客户端轮询任务状态获取结果，
+避免慢请求长时间占用Web服务线程。已完成任务的结果保留一段时间，并限制占用的内存总量。
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+import time
+import uuid
+
+class JobQueueFull(Exception):
+    """排队任务已达上限"""
+
+class JobQueue:
+    """
+    有界的后台任务队列与结果存储
+
+    Args:
+        name (str): 队列名称（用于线程名）
+        max_workers (int): 同时执行的任务数
+        max_queued (int): 等待执行的任务上限，超出时 submit 抛出 JobQueueFull
+        ttl (float): 已完成任务的结果保留秒数
+        max_bytes (int): 已完成任务结果（按JSON序列化大小计）的总内存上限，超出时先淘汰最早完成的任务
+    """
+
+    def __init__(self, name, max_workers=4, max_queued=100, ttl=600, max_bytes=64 * 1024 * 1024):
+        self.max_workers, self.max_queued, self.ttl, self.max_bytes = max_workers, max_queued, ttl, max_bytes
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"job-{name}")
+        self._jobs = OrderedDict()  # 任务ID -> 任务记录，按完成顺序排列已完成的任务
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+    def submit(self, fn, *args):
+        """提交任务，返回任务ID"""
+        with self._lock:
+            self._evict()
+            unfinished = sum(job["status"] in ("queued", "running") for job in self._jobs.values())
+            if unfinished >= self.max_workers + self.max_queued:
+                raise JobQueueFull(f"排队任务已达上限 {self.max_queued}")
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {"status": "queued", "created": time.time(), "finished": None,
+                                  "result": None, "error": None, "size": 0}
+        self._pool.submit(self._run, job_id, fn, args)
+        return job_id
+
+    def _run(self, job_id, fn, args):
+        with self._lock:
+            self._jobs[job_id]["status"] = "running"
+        try:
+            result, error = fn(*args), None
+            size = len(json.dumps(result, ensure_ascii=False, default=str).encode("utf-8"))
+            if size > self.max_bytes:
+                result, error, size = None, f"任务结果过大（{size}字节）", 0
+        except Exception as e:
+            result, error, size = None, str(e) or type(e).__name__, 0
+        with self._lock:
+            job = self._jobs.pop(job_id)
+            job.update(status="failed" if error else "done", finished=time.time(), result=result, error=error, size=size)
+            self._jobs[job_id] = job
+            self._bytes += size
+            self._evict()
+
+    def _evict(self):
+        """淘汰过期的已完成任务，并在超出内存上限时淘汰最早完成的任务（调用方持有锁）"""
+        now = time.time()
+        finished = [(job_id, job) for job_id, job in self._jobs.items() if job["finished"] is not None]
+        for job_id, job in finished:
+            if job["finished"] + self.ttl < now or self._bytes > self.max_bytes:
+                self._bytes -= self._jobs.pop(job_id)["size"]
+
+    def get(self, job_id):
+        """任务状态：status 为 queued/running/done/failed；任务不存在或已过期时返回None"""
+        with self._lock:
+            self._evict()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {k: job[k] for k in ("status", "created", "finished", "result", "error")}
+
+    def stats(self):
+        with self._lock:
+            counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+            return {**counts, "result_bytes": self._bytes, "max_workers": self.max_workers, "max_queued": self.max_queued}